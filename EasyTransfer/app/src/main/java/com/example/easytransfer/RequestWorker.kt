@@ -23,6 +23,7 @@ import okhttp3.OkHttpClient
 import okhttp3.Request
 import org.json.JSONObject
 import java.io.IOException
+import java.util.concurrent.TimeUnit
 import androidx.core.net.toUri
 import okhttp3.FormBody
 import okhttp3.MediaType.Companion.toMediaType
@@ -31,12 +32,17 @@ import okhttp3.RequestBody.Companion.toRequestBody
 
 class RequestService : Service() {
     private val handler = Handler(Looper.getMainLooper())
-    private val client = OkHttpClient()
+    // The server holds /requests/next open for up to longPollSeconds, so the read timeout must be longer
+    private val longPollSeconds = 25
+    private val client = OkHttpClient.Builder()
+        .readTimeout((longPollSeconds + 10).toLong(), TimeUnit.SECONDS)
+        .build()
     private var serverUrl: String? = null
     private var apiToken: String? = null
 
     private var password: String? = null
     private val delayMs: Long = 30_000
+    private val emptyPollDelayMs: Long = 1_000
 
     private val STATUS_FAILED = "Failed"
     private val STATUS_SUCCESS = "Success"
@@ -68,7 +74,7 @@ class RequestService : Service() {
             Log.d("RequestService", "🔄 Service is On...")
 
             val request = Request.Builder()
-                .url("$serverUrl/requests/next")
+                .url("$serverUrl/requests/next?wait=$longPollSeconds")
                 .addHeader("Authorization", "Bearer $apiToken")
                 .build()
 
@@ -88,10 +94,12 @@ class RequestService : Service() {
                                 "empty" -> {
                                     val msg = json.optString("message")
                                     Log.d("RequestService", "ℹ️ $msg")
-                                    handler.postDelayed(taskRunnable, delayMs)
+                                    // The server already waited for new requests; poll again right away
+                                    handler.postDelayed(taskRunnable, emptyPollDelayMs)
                                 }
                                 "ok" -> {
                                     val requestId = json.optInt("request_id")
+                                    val leaseToken = json.optInt("lease_token")
                                     val amount = json.optDouble("amount")
                                     val phone = json.optString("phone_number")
 
@@ -102,18 +110,18 @@ class RequestService : Service() {
 
                                     if (ActivityCompat.checkSelfPermission(this@RequestService, Manifest.permission.CALL_PHONE)
                                         != PackageManager.PERMISSION_GRANTED) {
-                                        updateServer(requestId, STATUS_FAILED, "Permission denied")
+                                        updateServer(requestId, leaseToken, STATUS_FAILED, "Permission denied")
                                         handler.postDelayed(taskRunnable, delayMs)
                                         return
                                     }
 
                                     sendUssd(this@RequestService, ussdCode,
                                         onSuccess = { response ->
-                                            updateServer(requestId, STATUS_SUCCESS, response)
+                                            updateServer(requestId, leaseToken, STATUS_SUCCESS, response)
                                             handler.postDelayed(taskRunnable, delayMs)
                                         },
                                         onFailure = { code ->
-                                            updateServer(requestId, STATUS_FAILED, "code=$code")
+                                            updateServer(requestId, leaseToken, STATUS_FAILED, "code=$code")
                                             handler.postDelayed(taskRunnable, delayMs)
                                         }
                                     )
@@ -201,8 +209,9 @@ class RequestService : Service() {
         }
     }
 
-    fun updateServer(requestId: Int, status: String, message: String) {
-        val json = """{"status": "$status","message": "$message"}""".trimIndent()
+    fun updateServer(requestId: Int, leaseToken: Int, status: String, message: String) {
+        // The lease token tells the server this result belongs to the current claim of the request
+        val json = """{"status": "$status","message": "$message","lease_token": $leaseToken}""".trimIndent()
 
         val body = json.toRequestBody("application/json; charset=utf-8".toMediaType())
 
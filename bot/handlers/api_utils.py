@@ -1,6 +1,8 @@
 import os
 import requests
-from typing import Dict, Any, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
 import logging
 
 import config
@@ -20,13 +22,33 @@ class APIError(Exception):
         self.status_code = status_code
         self.response_text = response_text
 
+# Responses kept for conditional GETs: (account_id, url, params) -> (ETag, parsed body)
+_ETAG_CACHE_SIZE = 512
+_etag_cache: "OrderedDict[Tuple, Tuple[str, Dict[str, Any]]]" = OrderedDict()
+_etag_lock = threading.Lock()
+
+def _cached_response(key: Tuple) -> Optional[Tuple[str, Dict[str, Any]]]:
+    with _etag_lock:
+        entry = _etag_cache.get(key)
+        if entry is not None:
+            _etag_cache.move_to_end(key)
+        return entry
+
+def _store_response(key: Tuple, etag: str, body: Dict[str, Any]) -> None:
+    with _etag_lock:
+        _etag_cache[key] = (etag, body)
+        _etag_cache.move_to_end(key)
+        while len(_etag_cache) > _ETAG_CACHE_SIZE:
+            _etag_cache.popitem(last=False)
+
 def make_api_request(
     endpoint: str,
     method: str = 'GET',
     data: Optional[Dict[str, Any]] = None,
     params: Optional[Dict[str, Any]] = None,
     headers: Optional[Dict[str, str]] = None,
-    account_id: Optional[str] = None
+    account_id: Optional[str] = None,
+    conditional: bool = False
 ) -> Dict[str, Any]:
     """
     Make an API request to the server.
@@ -37,6 +59,8 @@ def make_api_request(
         data: Request body (for POST/PUT)
         params: Query parameters
         account_id: Account ID to make the request for
+        conditional: For GET, send the cached ETag as If-None-Match and reuse
+            the cached body when the server answers 304 Not Modified
     Returns:
         Dict containing the API response
         
@@ -60,6 +84,14 @@ def make_api_request(
         else:
             logger.warning(f"No JWT token found for account {account_id}")
     
+    cache_key = None
+    cached = None
+    if conditional and method.upper() == 'GET':
+        cache_key = (str(account_id), url, tuple(sorted((params or {}).items())))
+        cached = _cached_response(cache_key)
+        if cached:
+            headers['If-None-Match'] = cached[0]
+    
     try:
         logger.info(f"Making {method} request to {url}")
         
@@ -75,6 +107,10 @@ def make_api_request(
         # Log the response (without sensitive data)
         logger.debug(f"API Response status: {response.status_code}")
         
+        # Unchanged since the cached copy
+        if response.status_code == 304 and cached:
+            return cached[1]
+        
         # Handle non-200 responses
         if not response.ok:
             error_msg = f"API request failed with status {response.status_code}"
@@ -89,7 +125,11 @@ def make_api_request(
         
         # Return the JSON response if available, otherwise return the raw text
         try:
-            return response.json()
+            body = response.json()
+            etag = response.headers.get('ETag')
+            if cache_key and etag:
+                _store_response(cache_key, etag, body)
+            return body
         except ValueError:
             return {"status": "success", "data": response.text}
             
@@ -109,7 +149,7 @@ def make_api_request(
 # Specific API functions
 def get_request_status(account_id:str, request_id: str) -> Dict[str, Any]:
     """Get the status of an request by ID"""
-    return make_api_request(f"requests/status/{request_id}", 'GET', account_id=account_id)
+    return make_api_request(f"requests/status/{request_id}", 'GET', account_id=account_id, conditional=True)
 
 def create_request(account_id: str, request_data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new request"""
@@ -118,7 +158,11 @@ def create_request(account_id: str, request_data: Dict[str, Any]) -> Dict[str, A
 # Contacts API functions
 def get_contacts(account_id: int) -> Dict[str, Any]:
     """Get list of all contacts for a specific account"""
-    return make_api_request(f"contacts/", 'GET', account_id=account_id)
+    return make_api_request(f"contacts/", 'GET', account_id=account_id, conditional=True)
+
+def resolve_contact(account_id: int, query: str, limit: int = 5) -> Dict[str, Any]:
+    """Resolve a typed name or phone number to ranked contact candidates"""
+    return make_api_request(f"contacts/resolve", 'GET', params={'q': query, 'limit': limit}, account_id=account_id)
 
 def add_contact(account_id: int, phone_number: str, name: str) -> Dict[str, Any]:
     """Add a new contact to an account"""
@@ -39,17 +39,17 @@ def validate_and_get_contact_info(contact_input: str, account_id: str) -> str:
     Supports both contact names and direct phone numbers.
     """
     try:
-        response = api_utils.get_contacts(account_id)
-        contacts = response.get('data', response.get('contacts', []))
-
-        # Check if input matches any existing contact name or phone
-        for contact in contacts:
-            contact_name_db = contact.get('name', '')
-            contact_phone_db = contact.get('phone_number', '')
-
-            # Check if input matches contact name (case insensitive)
-            if contact_name_db.lower() == contact_input.lower():
-                return contact_phone_db
+        response = api_utils.resolve_contact(account_id, contact_input)
+        candidates = response.get('candidates', [])
+
+        # Only an unambiguous name match is used; prefix and fuzzy candidates
+        # are suggestions and never pick the recipient of a transfer
+        exact = [c for c in candidates if c.get('match') == 'exact']
+        normalized = [c for c in candidates if c.get('match') == 'normalized']
+        if exact:
+            return exact[0].get('phone_number', '')
+        if len(normalized) == 1:
+            return normalized[0].get('phone_number', '')
 
         # If not found in contacts, check if it's a valid phone number
         if contact_input.isdigit() and len(contact_input) >= 10:
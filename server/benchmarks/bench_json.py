@@ -0,0 +1,149 @@
+"""
+JSON encoding and compression benchmark for the list endpoints
+
+Fills a throwaway database with one account holding a large contact list
+and request history, then times building the GET /contacts/ and
+GET /requests/ bodies three ways:
+
+  dicts + stdlib   rows -> dicts -> Flask's json provider (the old path)
+  dicts + orjson   rows -> dicts -> orjson
+  sqlite json      rows rendered by json_object() and spliced as fragments
+
+and reports the size and time of each available compression encoding.
+All three ways must produce the same bytes, which is checked first.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_json [--contacts 5000] [--requests 1000] [--repeat 50]
+"""
+import argparse
+import statistics
+import time
+from benchmarks.common import use_temp_database
+
+DB_PATH = use_temp_database()
+
+from flask import Flask  # noqa: E402
+from database.models import init_db, ContactModel, RequestModel  # noqa: E402
+from utils.compression import ENCODERS  # noqa: E402
+from utils.json_provider import (  # noqa: E402
+    StdlibJSONProvider, OrjsonProvider, orjson, fragment_array, jsonify_fragments,
+)
+from utils.units import iso_from_ms, from_minor_units  # noqa: E402
+
+ACCOUNT_ID = 1
+NAMES = ["أحمد", "محمد", "سارة", "Ali", "Zoë", "خالد", "ليلى", "Omar"]
+
+
+def fill(contacts, requests):
+    """Create `contacts` contacts and `requests` requests for ACCOUNT_ID"""
+    init_db()
+    for i in range(contacts):
+        ContactModel.add(ACCOUNT_ID, "09%08d" % i, f"{NAMES[i % len(NAMES)]} {i}", contacts)
+    for start in range(0, requests, 500):
+        count = min(500, requests - start)
+        RequestModel.add_many(ACCOUNT_ID, [("09%08d" % (start + i), 4500 + i) for i in range(count)])
+
+
+def contacts_from_dicts(app):
+    rows = ContactModel.get_by_account(ACCOUNT_ID)
+    contacts = [
+        {'id': row[0], 'phone_number': row[1], 'name': row[2], 'date_added': iso_from_ms(row[3])}
+        for row in rows
+    ]
+    return app.json.response({'contacts': contacts}).get_data()
+
+
+def contacts_from_sqlite(app):
+    return jsonify_fragments(contacts=fragment_array(ContactModel.get_json_by_account(ACCOUNT_ID))).get_data()
+
+
+def history_from_dicts(app, limit):
+    rows = RequestModel.get_page(ACCOUNT_ID, limit)
+    return app.json.response({
+        'requests': [
+            {
+                'request_id': request_id,
+                'phone_number': phone_number,
+                'amount': from_minor_units(amount),
+                'status': status,
+                'created_at': iso_from_ms(created_at)
+            }
+            for request_id, phone_number, amount, status, created_at in rows
+        ],
+        'next_cursor': None
+    }).get_data()
+
+
+def history_from_sqlite(app, limit):
+    rows = RequestModel.get_page(ACCOUNT_ID, limit, as_json=True)
+    return jsonify_fragments(requests=fragment_array(row[0] for row in rows), next_cursor=None).get_data()
+
+
+def median_ms(func, repeat):
+    """Median milliseconds per call over `repeat` calls"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--contacts', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    fill(args.contacts, args.requests)
+    apps = {}
+    for name, provider in [('stdlib', StdlibJSONProvider), ('orjson', OrjsonProvider)]:
+        if provider is OrjsonProvider and orjson is None:
+            print("orjson is not installed; skipping the orjson variant")
+            continue
+        apps[name] = Flask(__name__)
+        apps[name].json = provider(apps[name])
+
+    payloads = {
+        f"contacts ({args.contacts})": (contacts_from_dicts, contacts_from_sqlite),
+        f"history ({args.requests})": (
+            lambda app: history_from_dicts(app, args.requests),
+            lambda app: history_from_sqlite(app, args.requests),
+        ),
+    }
+
+    bodies = {}
+    print(f"{'payload':22}{'variant':18}{'ms/body':>10}{'vs old':>9}")
+    for payload, (from_dicts, from_sqlite) in payloads.items():
+        variants = [('dicts + ' + name, app, from_dicts) for name, app in apps.items()]
+        variants.append(('sqlite json', apps.get('orjson', apps['stdlib']), from_sqlite))
+
+        expected = None
+        for variant, app, build in variants:
+            with app.test_request_context():
+                body = build(app)
+                if expected is None:
+                    expected = body
+                assert body == expected, f"{variant} differs from dicts + stdlib for {payload}"
+        bodies[payload] = expected
+
+        baseline = None
+        for variant, app, build in variants:
+            with app.test_request_context():
+                elapsed = median_ms(lambda: build(app), args.repeat)
+            baseline = baseline or elapsed
+            print(f"{payload:22}{variant:18}{elapsed:>10.2f}{baseline / elapsed:>8.1f}x")
+
+    print()
+    print(f"{'payload':22}{'encoding':18}{'bytes':>10}{'ratio':>9}{'ms':>9}")
+    for payload, body in bodies.items():
+        print(f"{payload:22}{'identity':18}{len(body):>10}{1:>9.2f}{0:>9.2f}")
+        for encoding, compress in ENCODERS.items():
+            size = len(compress(body))
+            elapsed = median_ms(lambda: compress(body), args.repeat)
+            print(f"{payload:22}{encoding:18}{size:>10}{len(body) / size:>9.2f}{elapsed:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Before/after benchmark for the pooled, WAL-mode Database
+
+Runs the same workload (create a request, then claim it the way
+/requests/next does) twice: once with the original connect-per-query
+context manager on a rollback-journal database, once with the pool.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_pool [--threads 8] [--ops 2000]
+"""
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from benchmarks.common import use_temp_database
+
+DB_PATH = use_temp_database()
+
+from database import models  # noqa: E402
+from services.request_service import RequestService  # noqa: E402
+
+
+class LegacyDatabase:
+    """The original context manager: one connect/close per query"""
+
+    def __init__(self, immediate=False, path=None):
+        self.immediate = immediate
+        self.path = path
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        self.conn = sqlite3.connect(self.path or os.environ['DB_NAME'], timeout=30)
+        self.cursor = self.conn.cursor()
+        if self.immediate:
+            # The models' read-then-write blocks rely on it for correctness
+            self.cursor.execute("BEGIN IMMEDIATE")
+        return self.cursor
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        self.conn.close()
+
+
+def workload(threads, ops):
+    """Create and claim `ops` requests spread over `threads` threads"""
+    per_thread = ops // threads
+
+    def run(account_id):
+        for _ in range(per_thread):
+            RequestService.create_request(account_id, "0912345678", 45)
+            RequestService.get_next_pending(account_id)
+
+    workers = [threading.Thread(target=run, args=(i + 1,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return per_thread * threads, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=2000)
+    args = parser.parse_args()
+
+    legacy_path = DB_PATH + ".legacy"
+    pooled_database = models.Database
+
+    os.environ['DB_NAME'] = legacy_path
+    models.Database = LegacyDatabase
+    models.init_db()
+    done, legacy_elapsed = workload(args.threads, args.ops)
+    print(f"before (connect per query, rollback journal): {done / legacy_elapsed:8.0f} create+claim/s")
+
+    os.environ['DB_NAME'] = DB_PATH
+    models.Database = pooled_database
+    models.init_db()
+    done, pooled_elapsed = workload(args.threads, args.ops)
+    print(f"after  (pooled connections, WAL):             {done / pooled_elapsed:8.0f} create+claim/s")
+    print(f"speedup: {legacy_elapsed / pooled_elapsed:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
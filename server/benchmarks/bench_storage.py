@@ -0,0 +1,150 @@
+"""
+Row/index size and query-time comparison: ISO-8601 TEXT vs. integer units
+
+Builds the same synthetic requests table twice, once in the original
+layout (ISO-8601 TEXT timestamps, REAL amounts) and once with epoch
+milliseconds and integer minor units, with the same indexes. It then
+reports file, table and index sizes (via dbstat) and the time of the hot
+ordered queries.
+
+Usage (from the server directory):
+    python -m benchmarks.bench_storage [--rows 1000000] [--accounts 1000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+LAYOUTS = {
+    'text': ("TEXT", "REAL"),
+    'integer': ("INTEGER", "INTEGER"),
+}
+
+INDEXES = [
+    "CREATE INDEX idx_requests_account_status_created ON requests (account_id, status, created_at)",
+    "CREATE INDEX idx_requests_account_created ON requests (account_id, created_at)",
+    "CREATE INDEX idx_requests_status_lease ON requests (status, lease_expires_at)",
+]
+
+STATUSES = ["Done"] * 90 + ["Failed"] * 6 + ["Processing"] * 2 + ["Pending"] * 2
+
+
+def build(path, layout, rows, accounts):
+    """Create a requests table in the given layout and fill it"""
+    time_type, amount_type = LAYOUTS[layout]
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"""
+        CREATE TABLE requests (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            amount {amount_type} NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pending',
+            created_at {time_type} NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at {time_type}
+        )
+    """)
+
+    rng = random.Random(42)
+    start_ms = 1_700_000_000_000
+
+    def generate():
+        for i in range(rows):
+            created_ms = start_ms + i * 1000 + rng.randrange(1000)
+            lease_ms = created_ms + 300_000
+            amount_minor = rng.choice((4500, 9000, 18000, 45000, 90000))
+            status = rng.choice(STATUSES)
+            if layout == 'text':
+                created = datetime.fromtimestamp(created_ms / 1000, timezone.utc).isoformat()
+                lease = datetime.fromtimestamp(lease_ms / 1000, timezone.utc).isoformat()
+                amount = amount_minor / 100
+            else:
+                created, lease, amount = created_ms, lease_ms, amount_minor
+            yield (rng.randrange(1, accounts + 1), "09%08d" % rng.randrange(10 ** 8), amount, status,
+                   created, 1, lease if status == "Processing" else None)
+
+    conn.executemany(
+        "INSERT INTO requests (account_id, phone_number, amount, status, created_at, attempts, lease_expires_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        generate()
+    )
+    for index_sql in INDEXES:
+        conn.execute(index_sql)
+    conn.commit()
+    conn.execute("VACUUM")
+    return conn
+
+
+def sizes(conn):
+    """Return {table or index name: bytes} from the dbstat virtual table"""
+    return dict(conn.execute("SELECT name, SUM(pgsize) FROM dbstat GROUP BY name").fetchall())
+
+
+def time_query(conn, sql, params_list, repeat):
+    """Average milliseconds per execution over params_list x repeat runs"""
+    start = time.perf_counter()
+    runs = 0
+    for _ in range(repeat):
+        for params in params_list:
+            conn.execute(sql, params).fetchall()
+            runs += 1
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="easytransfer-storage-")
+    accounts = [(account_id,) for account_id in range(1, args.accounts + 1, max(args.accounts // 200, 1))]
+    results = {}
+    for layout in LAYOUTS:
+        path = os.path.join(directory, f"{layout}.sqlite3")
+        conn = build(path, layout, args.rows, args.accounts)
+        results[layout] = {
+            'file': os.path.getsize(path),
+            'sizes': sizes(conn),
+            'history': time_query(
+                conn,
+                "SELECT id, phone_number, amount, status, created_at FROM requests WHERE account_id=? "
+                "ORDER BY created_at DESC, id DESC LIMIT 20",
+                accounts, args.repeat),
+            'next_pending': time_query(
+                conn,
+                "SELECT id FROM requests WHERE status='Pending' AND account_id=? "
+                "ORDER BY created_at ASC, id ASC LIMIT 1",
+                accounts, args.repeat),
+            'full_history': time_query(
+                conn,
+                "SELECT id, created_at FROM requests WHERE account_id=? ORDER BY created_at DESC",
+                accounts, args.repeat),
+        }
+        conn.close()
+
+    def mib(value):
+        return f"{value / 1048576:9.1f} MiB"
+
+    print(f"{args.rows} requests over {args.accounts} accounts")
+    print(f"{'':38}{'text/real':>14}{'integer':>14}{'change':>9}")
+    rows = [("database file", results['text']['file'], results['integer']['file'])]
+    for name in ["requests", "idx_requests_account_status_created", "idx_requests_account_created",
+                 "idx_requests_status_lease"]:
+        rows.append((name, results['text']['sizes'][name], results['integer']['sizes'][name]))
+    for name, before, after in rows:
+        print(f"{name:38}{mib(before):>14}{mib(after):>14}{(after - before) / before:>+9.0%}")
+    for query in ['history', 'next_pending', 'full_history']:
+        before, after = results['text'][query], results['integer'][query]
+        print(f"{query + ' (ms/query)':38}{before:>14.3f}{after:>14.3f}{(after - before) / before:>+9.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+"""
+Query-plan and latency-budget checks against a generated dataset
+
+Run against a database from benchmarks.generate_dataset. First every
+statement in database/query_plans.HOT_QUERIES is explained on that
+database and must use an index, as in ``python -m database.query_plans``.
+Then each model method is timed through the real Database/pool path for
+the busiest account, an account of median activity and an account with a
+single request, and its p95 must stay within the budget in BUDGETS_MS
+(scaled by --budget-scale for slower machines). Methods without a budget
+are only reported. Exits with status 1 if any check fails.
+
+Production-like data keeps the pending backlog small, which hides any
+claim cost that grows with the number of pending rows across all
+accounts. So claim (10) is also timed with --backlog extra pending
+requests inserted for new accounts, inside a transaction that is rolled
+back at the end; the claim statement runs on that same connection.
+
+The dataset is not changed: the one write that is timed, claim, is undone
+after every call.
+
+Usage (from the server directory):
+    python -m benchmarks.check_dataset --db /tmp/dataset.sqlite3 [--samples 50] [--budget-scale 1.0]
+        [--backlog 500000]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from benchmarks.common import percentile
+
+# Method -> p95 budget in milliseconds; None only reports the timing
+BUDGETS_MS = {
+    'RequestModel.claim (10)': 10,
+    'RequestModel.claim (10), backlog': 10,
+    'RequestModel.get_by_id': 2,
+    'RequestModel.get_page (first)': 5,
+    'RequestModel.get_page (middle)': 5,
+    'RequestModel.get_page (json)': 5,
+    'RequestModel.get_page (Failed)': 10,
+    'RequestModel.get_page (2 statuses)': 5,
+    'RequestModel.get_pending_after': 5,
+    'RequestModel.get_all_pending': 100,
+    'RequestModel.count_active': 100,
+    # Loads the whole history; no route calls it any more
+    'RequestModel.get_by_account': None,
+    'ContactModel.get_version': 2,
+    'ContactModel.get_by_account': 2,
+    'ContactModel.get_json_by_account': 2,
+    'ContactModel.find_by_phone': 2,
+    'ContactModel.find_by_name': 2,
+    'ContactModel.find_by_prefix': 2,
+    'ContactModel.get_search_keys': 2,
+}
+
+# Methods that do not take an account and are timed once
+GLOBAL_METHODS = ('RequestModel.get_all_pending', 'RequestModel.count_active')
+
+
+def pick_accounts(c):
+    """Return {label: account_id} for the busiest, a median and a single-request account"""
+    c.execute("SELECT account_id, COUNT(*) FROM requests GROUP BY account_id ORDER BY 2 DESC, 1")
+    counts = c.fetchall()
+    return {
+        f'hot ({counts[0][1]:,})': counts[0][0],
+        f'median ({counts[len(counts) // 2][1]:,})': counts[len(counts) // 2][0],
+        f'cold ({counts[-1][1]:,})': counts[-1][0],
+    }
+
+
+def account_calls(c, account_id):
+    """Return {method: zero-argument callable} bound to `account_id`"""
+    from database.models import Database, RequestModel, ContactModel
+    from constants import STATUS_PENDING, STATUS_PROCESSING, STATUS_FAILED
+
+    c.execute(
+        "SELECT id, created_at FROM requests WHERE account_id=? ORDER BY created_at DESC, id DESC "
+        "LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM requests WHERE account_id=?)",
+        (account_id, account_id)
+    )
+    middle_id, middle_created_at = c.fetchone()
+    c.execute("SELECT phone_number, name_search FROM contacts WHERE account_id=? LIMIT 1", (account_id,))
+    phone, key = c.fetchone() or ("0900000000", "x")
+
+    def claim():
+        claimed = RequestModel.claim(account_id, 10, 300)
+        if claimed:
+            with Database(immediate=True) as undo:
+                undo.executemany(
+                    "UPDATE requests SET status=?, attempts=attempts - 1, lease_expires_at=NULL WHERE id=?",
+                    [(STATUS_PENDING, row[0]) for row in claimed]
+                )
+
+    return {
+        'RequestModel.claim (10)': claim,
+        'RequestModel.get_by_id': lambda: RequestModel.get_by_id(account_id, middle_id),
+        'RequestModel.get_page (first)': lambda: RequestModel.get_page(account_id, 21),
+        'RequestModel.get_page (middle)':
+            lambda: RequestModel.get_page(account_id, 21, (middle_created_at, middle_id)),
+        'RequestModel.get_page (json)': lambda: RequestModel.get_page(account_id, 21, as_json=True),
+        'RequestModel.get_page (Failed)': lambda: RequestModel.get_page(account_id, 21, None, [STATUS_FAILED]),
+        'RequestModel.get_page (2 statuses)':
+            lambda: RequestModel.get_page(account_id, 21, None, [STATUS_PENDING, STATUS_PROCESSING]),
+        'RequestModel.get_pending_after': lambda: RequestModel.get_pending_after(account_id, 0, 100),
+        'RequestModel.get_by_account': lambda: RequestModel.get_by_account(account_id),
+        'ContactModel.get_version': lambda: ContactModel.get_version(account_id),
+        'ContactModel.get_by_account': lambda: ContactModel.get_by_account(account_id),
+        'ContactModel.get_json_by_account': lambda: ContactModel.get_json_by_account(account_id),
+        'ContactModel.find_by_phone': lambda: ContactModel.find_by_phone(account_id, phone, 5),
+        'ContactModel.find_by_name': lambda: ContactModel.find_by_name(account_id, key, 5),
+        'ContactModel.find_by_prefix': lambda: ContactModel.find_by_prefix(account_id, key[:2], 5),
+        'ContactModel.get_search_keys': lambda: ContactModel.get_search_keys(account_id),
+    }
+
+
+def backlog_claim(db, backlog, samples):
+    """Return (p50, p95) of claiming 10 requests with `backlog` extra pending requests in the database"""
+    from database.models import RequestModel
+    from constants import STATUS_PENDING, STATUS_PROCESSING
+    from utils.units import now_ms
+
+    conn = sqlite3.connect(db, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        first_account = conn.execute("SELECT COALESCE(MAX(account_id), 0) + 1 FROM requests").fetchone()[0]
+        created_at = now_ms()
+        conn.executemany(
+            "INSERT INTO requests (account_id, phone_number, amount, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            ((first_account + i % 1000, "0912345678", 4500, STATUS_PENDING, created_at + i) for i in range(backlog))
+        )
+        params = (STATUS_PROCESSING, created_at + 300_000, STATUS_PENDING, first_account, 10, STATUS_PENDING)
+
+        def claim():
+            conn.execute("SAVEPOINT claim")
+            conn.execute(RequestModel.CLAIM_SQL, params).fetchall()
+            conn.execute("ROLLBACK TO claim")
+            conn.execute("RELEASE claim")
+
+        return time_call(claim, samples)
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def time_call(func, samples):
+    """Return (p50, p95) milliseconds of `samples` calls after one warm-up call"""
+    func()
+    elapsed = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        func()
+        elapsed.append((time.perf_counter() - start) * 1000)
+    return percentile(elapsed, 50), percentile(elapsed, 95)
+
+
+def report(name, target, p50, p95, budget):
+    """Print one timing line; return True if it is within budget"""
+    ok = budget is None or p95 <= budget
+    status = "ok" if ok else "FAIL"
+    if budget is None:
+        status = "info"
+    limit = f"{budget:.1f}" if budget is not None else "-"
+    print(f"[{status:4}] {name:36}{target:20}{p50:>10.2f}{p95:>10.2f}{limit:>10}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', required=True, help="database created by benchmarks.generate_dataset")
+    parser.add_argument('--samples', type=int, default=50, help="timed calls per method and account")
+    parser.add_argument('--budget-scale', type=float, default=1.0, help="multiply every budget by this")
+    parser.add_argument('--backlog', type=int, default=500_000,
+                        help="extra pending requests for the backlog claim check; 0 skips it")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist; create it with benchmarks.generate_dataset")
+    os.environ['DB_NAME'] = args.db
+    os.environ['ARCHIVE_DB_NAME'] = os.path.splitext(args.db)[0] + ".archive.sqlite3"
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix="easytransfer-check-metrics-")
+    os.environ.setdefault('DB_PROFILE', 'true')
+    os.environ.setdefault('SLOW_QUERY_MS', '60000')
+
+    from database.models import Database, RequestModel
+    from database.query_plans import HOT_QUERIES, check_query_plans, explain
+
+    failures = []
+    with Database() as c:
+        problems = check_query_plans(c)
+        for name, sql, params, _ in HOT_QUERIES:
+            status = "FAIL" if name in problems else "ok"
+            print(f"[{status:4}] {name}: {'; '.join(explain(c, sql, params))}")
+        failures.extend(f"plan: {name}" for name in problems)
+
+        accounts = pick_accounts(c)
+        calls = {label: account_calls(c, account_id) for label, account_id in accounts.items()}
+
+    print()
+    print(f"{'':7}{'method':36}{'account':20}{'p50 ms':>10}{'p95 ms':>10}{'budget':>10}")
+    for name in GLOBAL_METHODS:
+        budget = BUDGETS_MS[name] * args.budget_scale
+        func = getattr(RequestModel, name.split('.')[1])
+        if not report(name, 'all', *time_call(func, args.samples), budget):
+            failures.append(name)
+    for name, budget in BUDGETS_MS.items():
+        if name in GLOBAL_METHODS or name == 'RequestModel.claim (10), backlog':
+            continue
+        budget = budget * args.budget_scale if budget is not None else None
+        # Unbudgeted methods can take seconds on the busiest account
+        samples = args.samples if budget is not None else min(args.samples, 5)
+        for label in accounts:
+            if not report(name, label, *time_call(calls[label][name], samples), budget):
+                failures.append(f"{name} [{label}]")
+    if args.backlog:
+        name = 'RequestModel.claim (10), backlog'
+        label = f'+{args.backlog:,} pending'
+        if not report(name, label, *backlog_claim(args.db, args.backlog, args.samples),
+                      BUDGETS_MS[name] * args.budget_scale):
+            failures.append(f"{name} [{label}]")
+
+    print()
+    if failures:
+        print(f"{len(failures)} check(s) failed:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("all checks passed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Shared helpers for the benchmark scripts
+
+Benchmarks run from the server directory (``python -m benchmarks.<name>``)
+and always work on throwaway databases, selected through the ``DB_NAME``
+and ``ARCHIVE_DB_NAME`` environment variables before any server module is
+imported.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+
+def use_temp_database(prefix="easytransfer-bench-"):
+    """Point the server at a fresh database (and archive) file, with profiling on, and return its path"""
+    directory = tempfile.mkdtemp(prefix=prefix)
+    path = os.path.join(directory, "db.sqlite3")
+    os.environ['DB_NAME'] = path
+    os.environ['ARCHIVE_DB_NAME'] = os.path.join(directory, "archive.sqlite3")
+    # Profile statements unless the caller turned it off to measure without it
+    os.environ.setdefault('DB_PROFILE', 'true')
+    return path
+
+
+def timed(func, *args, **kwargs):
+    """Run func and return (result, elapsed seconds)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return mean/p50/p95/p99 of latency samples in milliseconds"""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+    }
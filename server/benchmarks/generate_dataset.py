@@ -0,0 +1,201 @@
+"""
+Bulk generator of a large, realistically skewed database
+
+Creates the schema with init_db() and then writes straight into it with
+one connection, synchronous=OFF and the secondary indexes dropped until
+the end, so tens of millions of rows take minutes instead of the hours
+the model methods would need. The shape follows production traffic:
+
+  accounts   Zipf-distributed activity; account 1 is the busiest, and the
+             few hottest accounts hold long histories
+  requests   ids and created_at increase together over --days; the newest
+             rows are the live backlog (Pending, or Processing under a
+             lease, some of them expired), older rows are Done or Failed
+  results    one per finished request, as the devices report them
+  contacts   up to MAX_CONTACTS_PER_ACCOUNT per active account, with the
+             normalized names and search keys ContactModel.add stores
+
+The same --seed always produces the same database.
+
+Usage (from the server directory):
+    python -m benchmarks.generate_dataset --db /tmp/dataset.sqlite3
+        [--requests 10000000] [--accounts 100000] [--skew 1.1] [--days 180] [--seed 42]
+"""
+import argparse
+import bisect
+import itertools
+import os
+import random
+import sqlite3
+import time
+
+CHUNK = 100_000
+NAMES = ["أحمد", "محمد", "سارة", "فاطمة", "خالد", "ليلى", "عمر", "يوسف", "Ali", "Zoë", "Omar", "Lina"]
+AMOUNTS = (1000, 2500, 4500, 9000, 18000, 45000, 90000)
+FAILURE_MESSAGES = ("رصيد غير كاف", "الرقم غير صحيح", "انتهت مهلة الاتصال")
+
+
+def zipf_weights(count, skew):
+    """Cumulative weights of ranks 1..count under a Zipf law with exponent `skew`"""
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+
+def generate_requests(args, now_ms, statuses, max_attempts):
+    """Yield request rows (id, account_id, phone_number, amount, status, created_at, attempts, lease_expires_at)"""
+    pending, processing, done, failed = statuses
+    rng = random.Random(args.seed)
+    cumulative = zipf_weights(args.accounts, args.skew)
+    total = cumulative[-1]
+    span_ms = args.days * 86_400_000
+    start_ms = now_ms - span_ms
+    live = int(args.requests * (args.pending + args.processing))
+    processing_share = args.processing / (args.pending + args.processing) if live else 0
+
+    for request_id in range(1, args.requests + 1):
+        account_id = bisect.bisect_left(cumulative, rng.random() * total) + 1
+        # Senders mostly top up the same few numbers
+        phone_number = "09%08d" % ((account_id * 7919 + rng.randrange(8) * 104_729) % 10 ** 8)
+        created_at = start_ms + span_ms * request_id // args.requests
+        attempts, lease_expires_at = 1, None
+        if request_id > args.requests - live:
+            if rng.random() < processing_share:
+                status = processing
+                attempts = rng.randint(1, max_attempts)
+                expired = rng.random() < args.expired
+                lease_expires_at = now_ms + (-1 if expired else 1) * rng.randrange(1, 300_000)
+            else:
+                status, attempts = pending, 0
+        elif rng.random() < args.failed:
+            status = failed
+            attempts = rng.choice((1, max_attempts))
+        else:
+            status = done
+            attempts = 1 if rng.random() < 0.97 else 2
+        yield (request_id, account_id, phone_number, rng.choice(AMOUNTS), status, created_at,
+               attempts, lease_expires_at)
+
+
+def insert_chunks(conn, sql, rows, label, total):
+    """Insert `rows` in chunks of CHUNK, printing progress; `total` may be None when unknown"""
+    started = time.perf_counter()
+    done = 0
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK))
+        if not chunk:
+            break
+        conn.executemany(sql, chunk)
+        done += len(chunk)
+        elapsed = time.perf_counter() - started
+        count = f"{done:,}/{total:,}" if total else f"{done:,}"
+        print(f"\r{label}: {count} ({done / elapsed:,.0f} rows/s)", end='', flush=True)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--db', required=True, help="database file to create; the archive goes next to it")
+    parser.add_argument('--requests', type=int, default=10_000_000)
+    parser.add_argument('--accounts', type=int, default=100_000)
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of account activity")
+    parser.add_argument('--days', type=int, default=180, help="period the history spans")
+    parser.add_argument('--pending', type=float, default=0.002, help="share of requests still pending")
+    parser.add_argument('--processing', type=float, default=0.01, help="share of requests under a lease")
+    parser.add_argument('--expired', type=float, default=0.3, help="share of leases that already ran out")
+    parser.add_argument('--failed', type=float, default=0.06, help="share of finished requests that failed")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="replace an existing database file")
+    args = parser.parse_args()
+
+    archive = os.path.splitext(args.db)[0] + ".archive.sqlite3"
+    for path in (args.db, archive):
+        if os.path.exists(path):
+            if not args.force:
+                parser.error(f"{path} exists; pass --force to replace it")
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+    os.environ['DB_NAME'] = args.db
+    os.environ['ARCHIVE_DB_NAME'] = archive
+
+    from database.models import init_db
+    from database.pool import get_pool
+    from config import MAX_ATTEMPTS, MAX_CONTACTS_PER_ACCOUNT
+    from constants import STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED, STATUS_SUCCESS
+    from utils.names import normalize_name, search_key, phone_key
+    from utils.units import now_ms
+
+    init_db()
+    get_pool(args.db).close_all()
+    get_pool(archive).close_all()
+
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-1000000")
+    conn.execute("BEGIN")
+    # Rebuilding an index from sorted rows is far cheaper than maintaining it row by row
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND sql IS NOT NULL"
+    ).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+
+    now = now_ms()
+    statuses = (STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED)
+    insert_chunks(
+        conn,
+        "INSERT INTO requests (id, account_id, phone_number, amount, status, created_at, attempts, "
+        "lease_expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        generate_requests(args, now, statuses, MAX_ATTEMPTS),
+        "requests", args.requests
+    )
+
+    print("results: copying from finished requests")
+    rng = random.Random(args.seed + 1)
+    conn.create_function('failure_message', 1, lambda _: rng.choice(FAILURE_MESSAGES), deterministic=False)
+    conn.execute(
+        "INSERT INTO results (account_id, request_id, status, message, created_at) "
+        "SELECT account_id, id, CASE status WHEN ? THEN ? ELSE ? END, "
+        "CASE status WHEN ? THEN '' ELSE failure_message(id) END, created_at + 20000 + id % 40000 "
+        "FROM requests WHERE status IN (?, ?) ORDER BY id",
+        (STATUS_DONE, STATUS_SUCCESS, STATUS_FAILED, STATUS_DONE, STATUS_DONE, STATUS_FAILED)
+    )
+
+    active = [row[0] for row in conn.execute("SELECT DISTINCT account_id FROM requests ORDER BY account_id")]
+
+    def generate_contacts():
+        start_ms = now - args.days * 86_400_000
+        for account_id in active:
+            # The busiest accounts keep a full contact list
+            count = MAX_CONTACTS_PER_ACCOUNT if account_id <= 1000 else rng.randint(0, MAX_CONTACTS_PER_ACCOUNT)
+            for i in range(count):
+                name = f"{NAMES[(account_id + i) % len(NAMES)]} {i}"
+                phone_number = "09%08d" % ((account_id * 7919 + i * 104_729) % 10 ** 8)
+                yield (account_id, phone_number, name, normalize_name(name), search_key(name),
+                       phone_key(phone_number), start_ms + rng.randrange(args.days * 86_400_000))
+
+    insert_chunks(
+        conn,
+        "INSERT INTO contacts (account_id, phone_number, name, name_normalized, name_search, phone_search, "
+        "date_added) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        generate_contacts(),
+        "contacts", None
+    )
+    conn.execute(
+        "INSERT INTO contact_versions (account_id, version) SELECT account_id, COUNT(*) FROM contacts "
+        "GROUP BY account_id"
+    )
+
+    for name, sql in indexes:
+        index_started = time.perf_counter()
+        conn.execute(sql)
+        print(f"index {name}: {time.perf_counter() - index_started:.1f}s")
+    conn.execute("COMMIT")
+    conn.close()
+
+    size = os.path.getsize(args.db)
+    print(f"{args.db}: {size / 2 ** 20:,.0f} MiB in {time.perf_counter() - started:.0f}s")
+
+
+if __name__ == '__main__':
+    main()
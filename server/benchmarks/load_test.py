@@ -0,0 +1,314 @@
+"""
+End-to-end load test with simulated devices and bot clients
+
+Starts the server locally (gunicorn, or Flask's threaded dev server) on a
+throwaway database, or targets a running one with --url, then drives it
+over HTTP:
+
+  bot clients   create transfers at --rate per second (open loop) for
+                --duration seconds, spread over --accounts accounts
+  devices       --devices per account, each looping like RequestWorker.kt:
+                long-poll GET /requests/next, sleep for the USSD call, then
+                POST /requests/<id>/result
+
+After the creation phase the devices drain the queue. The report gives
+throughput, p50/p95/p99 create-to-claim and claim-to-result latency, the
+latency of each endpoint, HTTP errors and, for a local server, the SQLite
+lock errors and pool timeouts found in its log.
+
+Usage (from the server directory):
+    python -m benchmarks.load_test [--accounts 10] [--devices 1] [--bots 4] [--rate 20]
+                                   [--duration 30] [--ussd-ms 1500] [--workers 2]
+    python -m benchmarks.load_test --url http://host:8080 --secret $JWT_SECRET
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+import jwt
+from benchmarks.common import summarize
+
+LOCK_ERROR_MARKERS = ("database is locked", "database table is locked")
+POOL_TIMEOUT_MARKER = "Timed out waiting for a database connection"
+
+
+class Client:
+    """Keep-alive JSON client for one simulated bot or device thread"""
+
+    def __init__(self, base_url, token, stats):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self.stats = stats
+        self.conn = None
+
+    def request(self, method, path, label, body=None, timeout=60):
+        """Send one request; returns (status, parsed body), or (None, None) on a connection error"""
+        data = json.dumps(body) if body is not None else None
+        # A kept-alive connection may have been closed by the server meanwhile; retry once on a new one
+        for attempt in range(2):
+            reused = self.conn is not None
+            if not reused:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            self.conn.timeout = timeout
+            started = time.monotonic()
+            try:
+                self.conn.request(method, path, body=data, headers=self.headers)
+                response = self.conn.getresponse()
+                payload = response.read()
+                break
+            except (OSError, http.client.HTTPException):
+                self.conn.close()
+                self.conn = None
+                if not reused or attempt:
+                    self.stats.record_error(label, 'connection')
+                    return None, None
+        self.stats.record_call(label, response.status, time.monotonic() - started)
+        try:
+            return response.status, json.loads(payload) if payload else None
+        except ValueError:
+            return response.status, None
+
+
+class Stats:
+    """Timestamps and counters shared by every simulated client"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.created = {}
+        self.claimed = {}
+        self.finished = {}
+        self.calls = {}
+        self.statuses = {}
+        self.errors = {}
+
+    def record_call(self, label, status, seconds):
+        with self.lock:
+            self.calls.setdefault(label, []).append(seconds)
+            self.statuses[(label, status)] = self.statuses.get((label, status), 0) + 1
+
+    def record_error(self, label, kind):
+        with self.lock:
+            self.errors[(label, kind)] = self.errors.get((label, kind), 0) + 1
+
+    def mark(self, table, request_id, when):
+        with self.lock:
+            table.setdefault(request_id, when)
+
+
+def make_token(secret, account_id):
+    return jwt.encode({'sub': str(account_id)}, secret, algorithm='HS256')
+
+
+def run_bot(base_url, secret, accounts, rate, stop, stats, rng):
+    """Create transfers for random accounts, `rate` per second, until `stop` is set"""
+    clients = {account_id: Client(base_url, make_token(secret, account_id), stats) for account_id in accounts}
+    interval = 1 / rate
+    next_at = time.monotonic()
+    while not stop.is_set():
+        next_at += rng.expovariate(1 / interval)
+        delay = next_at - time.monotonic()
+        if delay > 0 and stop.wait(delay):
+            return
+        account_id = rng.choice(accounts)
+        sent = time.monotonic()
+        status, body = clients[account_id].request('POST', '/requests/', 'POST /requests/', {
+            'phone_number': "09%08d" % rng.randrange(10 ** 8),
+            'amount': rng.choice((45, 90, 180, 450)),
+        })
+        if status == 201:
+            stats.mark(stats.created, body['request_id'], sent)
+
+
+def run_device(base_url, secret, account_id, args, done, stats, rng):
+    """Claim, 'dial' and report like RequestWorker.kt until `done` is set"""
+    client = Client(base_url, make_token(secret, account_id), stats)
+    path = f"/requests/next?wait={args.poll_wait}"
+    while not done.is_set():
+        status, body = client.request('GET', path, 'GET /requests/next', timeout=args.poll_wait + 30)
+        if status != 200 or body.get('status') != 'ok':
+            if status != 200:
+                done.wait(1)  # Back off after errors instead of hammering the server
+            continue
+        stats.mark(stats.claimed, body['request_id'], time.monotonic())
+
+        time.sleep(max(0.0, rng.gauss(args.ussd_ms, args.ussd_jitter_ms)) / 1000)
+        failed = rng.random() < args.failure_rate
+        status, _ = client.request('POST', f"/requests/{body['request_id']}/result",
+                                   'POST /requests/<id>/result', {
+                                       'status': 'Failed' if failed else 'Success',
+                                       'message': 'simulated',
+                                       'lease_token': body['lease_token'],
+                                   })
+        if status == 200:
+            stats.mark(stats.finished, body['request_id'], time.monotonic())
+
+
+def start_server(args, port):
+    """Start the server on a throwaway database; returns (process, log path)"""
+    directory = tempfile.mkdtemp(prefix="easytransfer-load-")
+    env = dict(
+        os.environ,
+        DB_NAME=os.path.join(directory, "db.sqlite3"),
+        ARCHIVE_DB_NAME=os.path.join(directory, "archive.sqlite3"),
+        METRICS_DIR=os.path.join(directory, "metrics"),
+        JWT_SECRET=args.secret,
+        DB_PROFILE=os.environ.get('DB_PROFILE', 'true'),
+    )
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'main:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads)]
+    else:
+        command = [sys.executable, '-m', 'flask', '--app', 'main', 'run', '--port', str(port), '--with-threads']
+    log_path = os.path.join(directory, "server.log")
+    log = open(log_path, 'w')
+    process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+    return process, log_path
+
+
+def wait_until_up(base_url, process, timeout=30):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit("server exited during startup; see its log")
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=1)
+            conn.request('GET', '/ping')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit(f"server at {base_url} did not answer /ping within {timeout}s")
+
+
+def count_log_errors(log_path):
+    """Return (SQLite lock errors, pool timeouts) mentioned in the server log"""
+    locks = timeouts = 0
+    with open(log_path, errors='replace') as f:
+        for line in f:
+            locks += any(marker in line for marker in LOCK_ERROR_MARKERS)
+            timeouts += POOL_TIMEOUT_MARKER in line
+    return locks, timeouts
+
+
+def report(args, stats, elapsed, drained_at, log_errors):
+    created, claimed, finished = stats.created, stats.claimed, stats.finished
+    create_to_claim = [claimed[i] - created[i] for i in claimed if i in created]
+    claim_to_result = [finished[i] - claimed[i] for i in finished if i in claimed]
+
+    print(f"accounts {args.accounts}, devices {args.accounts * args.devices}, bots {args.bots}, "
+          f"target rate {args.rate}/s, ussd {args.ussd_ms}±{args.ussd_jitter_ms} ms")
+    print(f"creation phase {elapsed:.1f}s, drained after {drained_at:.1f}s")
+    print(f"created  {len(created):7d}  {len(created) / elapsed:8.1f}/s")
+    print(f"claimed  {len(claimed):7d}  {len(claimed) / drained_at:8.1f}/s")
+    print(f"finished {len(finished):7d}  {len(finished) / drained_at:8.1f}/s")
+    unfinished = len(set(created) - set(finished))
+    if unfinished:
+        print(f"unfinished {unfinished}")
+
+    print()
+    print(f"{'latency (ms)':30}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = [('create -> claim', create_to_claim), ('claim -> result', claim_to_result)]
+    rows += sorted(stats.calls.items())
+    for label, samples in rows:
+        summary = summarize(samples)
+        if summary['count']:
+            print(f"{label:30}{summary['count']:>8}{summary['mean_ms']:>9.1f}{summary['p50_ms']:>9.1f}"
+                  f"{summary['p95_ms']:>9.1f}{summary['p99_ms']:>9.1f}")
+
+    print()
+    errors = {key: count for key, count in stats.statuses.items() if key[1] >= 400}
+    for (label, status), count in sorted(errors.items()):
+        print(f"HTTP {status} on {label}: {count}")
+    for (label, kind), count in sorted(stats.errors.items()):
+        print(f"{kind} errors on {label}: {count}")
+    if log_errors is not None:
+        locks, timeouts = log_errors
+        print(f"SQLite lock errors in server log: {locks}")
+        print(f"connection pool timeouts in server log: {timeouts}")
+    if not errors and not stats.errors:
+        print("no HTTP errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--accounts', type=int, default=10)
+    parser.add_argument('--devices', type=int, default=1, help="devices per account")
+    parser.add_argument('--bots', type=int, default=4, help="concurrent bot clients")
+    parser.add_argument('--rate', type=float, default=20, help="transfers created per second, in total")
+    parser.add_argument('--duration', type=float, default=30, help="seconds of creation")
+    parser.add_argument('--drain-timeout', type=float, default=120)
+    parser.add_argument('--ussd-ms', type=float, default=1500, help="mean simulated USSD call time")
+    parser.add_argument('--ussd-jitter-ms', type=float, default=500)
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--poll-wait', type=int, default=20, help="long-poll seconds on /requests/next")
+    parser.add_argument('--server', choices=('gunicorn', 'flask'), default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn worker processes")
+    parser.add_argument('--threads', type=int, default=16, help="gunicorn threads per worker")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--url', help="target a running server instead of starting one")
+    parser.add_argument('--secret', default=os.getenv('JWT_SECRET', 'load-test-secret'))
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    process = log_path = None
+    base_url = args.url
+    if base_url is None:
+        process, log_path = start_server(args, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        wait_until_up(base_url, process)
+        stats = Stats()
+        stop, done = threading.Event(), threading.Event()
+        rng = random.Random(args.seed)
+        accounts = list(range(1, args.accounts + 1))
+
+        devices = [
+            threading.Thread(target=run_device, daemon=True,
+                             args=(base_url, args.secret, account_id, args, done, stats,
+                                   random.Random(rng.random())))
+            for account_id in accounts for _ in range(args.devices)
+        ]
+        bots = [
+            threading.Thread(target=run_bot, daemon=True,
+                             args=(base_url, args.secret, accounts, args.rate / args.bots, stop, stats,
+                                   random.Random(rng.random())))
+            for _ in range(args.bots)
+        ]
+        for thread in devices + bots:
+            thread.start()
+
+        started = time.monotonic()
+        time.sleep(args.duration)
+        stop.set()
+        for bot in bots:
+            bot.join()
+        elapsed = time.monotonic() - started
+
+        deadline = time.monotonic() + args.drain_timeout
+        while time.monotonic() < deadline:
+            with stats.lock:
+                if set(stats.created) <= set(stats.finished):
+                    break
+            time.sleep(0.2)
+        drained_at = time.monotonic() - started
+        done.set()
+
+        log_errors = count_log_errors(log_path) if log_path else None
+        report(args, stats, elapsed, drained_at, log_errors)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
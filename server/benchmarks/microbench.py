@@ -0,0 +1,490 @@
+"""
+Micro-benchmarks for the per-request hot paths, with stored results
+
+Covers token verification and require_auth, the validate_* functions,
+every RequestModel/ContactModel read and the common writes against a
+pre-populated throwaway database, and whole routes through the test
+client, which includes their JSON rendering. Each benchmark is calibrated
+to run for about --min-time seconds and reports the median and minimum
+time per call over --rounds rounds.
+
+Results can be written as JSON and compared with a previous run from the
+same machine; any benchmark whose median and minimum both got slower by
+more than --threshold is reported as a regression and makes the script
+exit with status 1.
+
+Usage (from the server directory):
+    python -m benchmarks.microbench [--requests 100000] [--accounts 100] [--contacts 5]
+                                    [--filter model.] [--output run.json] [--baseline base.json]
+    python -m benchmarks.microbench --compare base.json run.json [--threshold 0.15]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from benchmarks.common import use_temp_database
+
+BENCH_DIR = os.path.dirname(use_temp_database(prefix="easytransfer-microbench-"))
+os.environ.setdefault('JWT_SECRET', 'microbench-secret')
+os.environ['METRICS_DIR'] = os.path.join(BENCH_DIR, "metrics")
+os.environ.setdefault('SLOW_QUERY_MS', '60000')  # Filling the database is slow on purpose
+
+import jwt  # noqa: E402
+from flask import Flask  # noqa: E402
+from database.models import Database, init_db, RequestModel, ResultModel, ContactModel  # noqa: E402
+from routes.request_routes import request_bp  # noqa: E402
+from routes.contact_routes import contact_bp  # noqa: E402
+from utils import validation  # noqa: E402
+from utils.auth import require_auth, verify_token, verify_account_id, JWT_SECRET  # noqa: E402
+from utils.compression import init_compression  # noqa: E402
+from utils.json_provider import get_json_provider, fragment_array, jsonify_fragments  # noqa: E402
+from utils.metrics import init_request_metrics  # noqa: E402
+from utils.units import now_ms, iso_from_ms, from_minor_units  # noqa: E402
+from config import JSON_PROVIDER, LEASE_SECONDS, MAX_ATTEMPTS  # noqa: E402
+from constants import STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED, STATUS_SUCCESS  # noqa: E402
+
+ACCOUNT_ID = 1
+WRITE_ACCOUNT_ID = 0  # Writes go to an account of their own so reads see a stable dataset
+STATUSES = [STATUS_DONE] * 90 + [STATUS_FAILED] * 6 + [STATUS_PROCESSING] * 2 + [STATUS_PENDING] * 2
+NAMES = ["أحمد", "محمد", "سارة", "Ali", "Zoë", "خالد", "ليلى", "Omar"]
+
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Register a factory that takes the Context and returns the callable to time"""
+    def register(factory):
+        BENCHMARKS.append((name, factory))
+        return factory
+    return register
+
+
+class Context:
+    """The populated database and app shared by every benchmark"""
+
+    def __init__(self, requests, accounts, contacts):
+        init_db()
+        rng = random.Random(42)
+        start = now_ms() - requests * 1000
+        rows = [
+            (rng.randrange(1, accounts + 1), "09%08d" % rng.randrange(10 ** 8),
+             rng.choice((4500, 9000, 18000, 45000)), rng.choice(STATUSES), start + i * 1000, 1)
+            for i in range(requests)
+        ]
+        with Database(immediate=True) as c:
+            c.executemany(
+                "INSERT INTO requests (account_id, phone_number, amount, status, created_at, attempts) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        for account_id in range(1, accounts + 1):
+            for i in range(contacts):
+                ContactModel.add(account_id, "09%08d" % (account_id * 1000 + i),
+                                 f"{NAMES[i % len(NAMES)]} {i}", contacts)
+
+        history = RequestModel.get_page(ACCOUNT_ID, 20)
+        self.request_id = history[0][0]
+        self.cursor = (history[-1][4], history[-1][0])
+        self.contact_ids = [row[0] for row in ContactModel.get_by_account(ACCOUNT_ID)]
+        self.search_key = ContactModel.get_search_keys(ACCOUNT_ID)[0][1]
+        self.token = jwt.encode({'sub': str(ACCOUNT_ID)}, JWT_SECRET, algorithm='HS256')
+        self.headers = {'Authorization': f'Bearer {self.token}'}
+
+        # create_app() without its background jobs
+        self.app = Flask(__name__)
+        self.app.json = get_json_provider(JSON_PROVIDER)(self.app)
+        init_compression(self.app)
+        init_request_metrics(self.app)
+        self.app.register_blueprint(request_bp)
+        self.app.register_blueprint(contact_bp)
+        self.client = self.app.test_client()
+
+
+# Authentication
+
+@benchmark('auth.verify_token')
+def bench_verify_token(ctx):
+    return lambda: verify_token(ctx.token)
+
+
+@benchmark('auth.verify_account_id (cached)')
+def bench_verify_account_id(ctx):
+    verify_account_id(ctx.token)
+    return lambda: verify_account_id(ctx.token)
+
+
+@benchmark('auth.require_auth')
+def bench_require_auth(ctx):
+    return require_auth(lambda account_id: account_id)
+
+
+# Validation
+
+@benchmark('validation.validate_phone_number')
+def bench_validate_phone_number(ctx):
+    return lambda: validation.validate_phone_number("0912345678")
+
+
+@benchmark('validation.validate_name')
+def bench_validate_name(ctx):
+    return lambda: validation.validate_name("محمد أحمد")
+
+
+@benchmark('validation.validate_amount')
+def bench_validate_amount(ctx):
+    return lambda: validation.validate_amount("45.50")
+
+
+@benchmark('validation.validate_request_id')
+def bench_validate_request_id(ctx):
+    return lambda: validation.validate_request_id("12345")
+
+
+@benchmark('validation.validate_contact_id')
+def bench_validate_contact_id(ctx):
+    return lambda: validation.validate_contact_id("12")
+
+
+@benchmark('validation.sanitize_input')
+def bench_sanitize_input(ctx):
+    return lambda: validation.sanitize_input("  محمد <b>أحمد</b>  ")
+
+
+# RequestModel
+
+@benchmark('model.RequestModel.claim (10, undone)')
+def bench_claim(ctx):
+    def run():
+        claimed = RequestModel.claim(ACCOUNT_ID, 10, LEASE_SECONDS)
+        # Put the requests back so every call claims from the same backlog
+        with Database(immediate=True) as c:
+            c.executemany(
+                "UPDATE requests SET status=?, attempts=attempts - 1, lease_expires_at=NULL WHERE id=?",
+                [(STATUS_PENDING, row[0]) for row in claimed]
+            )
+    return run
+
+
+@benchmark('model.RequestModel.get_by_id')
+def bench_request_get_by_id(ctx):
+    return lambda: RequestModel.get_by_id(ACCOUNT_ID, ctx.request_id)
+
+
+@benchmark('model.RequestModel.get_by_account')
+def bench_request_get_by_account(ctx):
+    return lambda: RequestModel.get_by_account(ACCOUNT_ID)
+
+
+@benchmark('model.RequestModel.get_page')
+def bench_get_page(ctx):
+    return lambda: RequestModel.get_page(ACCOUNT_ID, 21, ctx.cursor)
+
+
+@benchmark('model.RequestModel.get_page (json)')
+def bench_get_page_json(ctx):
+    return lambda: RequestModel.get_page(ACCOUNT_ID, 21, ctx.cursor, as_json=True)
+
+
+@benchmark('model.RequestModel.get_page (status filter)')
+def bench_get_page_filtered(ctx):
+    return lambda: RequestModel.get_page(ACCOUNT_ID, 21, None, [STATUS_FAILED])
+
+
+@benchmark('model.RequestModel.get_pending_after')
+def bench_get_pending_after(ctx):
+    return lambda: RequestModel.get_pending_after(ACCOUNT_ID, 0, 100)
+
+
+@benchmark('model.RequestModel.get_all_pending')
+def bench_get_all_pending(ctx):
+    return RequestModel.get_all_pending
+
+
+@benchmark('model.RequestModel.count_active')
+def bench_count_active(ctx):
+    return RequestModel.count_active
+
+
+@benchmark('model.RequestModel.reap_expired_leases')
+def bench_reap(ctx):
+    return lambda: RequestModel.reap_expired_leases(MAX_ATTEMPTS, 500)
+
+
+@benchmark('model.RequestModel.add')
+def bench_request_add(ctx):
+    return lambda: RequestModel.add(WRITE_ACCOUNT_ID, "0912345678", 4500)
+
+
+@benchmark('model.RequestModel.add_many (10)')
+def bench_request_add_many(ctx):
+    items = [("0912345678", 4500)] * 10
+    return lambda: RequestModel.add_many(WRITE_ACCOUNT_ID, items)
+
+
+@benchmark('model.RequestModel.update_status')
+def bench_update_status(ctx):
+    return lambda: RequestModel.update_status(ACCOUNT_ID, ctx.request_id, STATUS_DONE)
+
+
+@benchmark('model.lifecycle (add + claim + record_many)')
+def bench_lifecycle(ctx):
+    account_id = -1
+
+    def run():
+        RequestModel.add(account_id, "0912345678", 4500)
+        (request_id, _, _, lease_token), = RequestModel.claim(account_id, 1, LEASE_SECONDS)
+        ResultModel.record_many(account_id, [(request_id, STATUS_SUCCESS, STATUS_DONE, "", lease_token)])
+    return run
+
+
+# ContactModel
+
+@benchmark('model.ContactModel.get_version')
+def bench_contact_version(ctx):
+    return lambda: ContactModel.get_version(ACCOUNT_ID)
+
+
+@benchmark('model.ContactModel.get_by_account')
+def bench_contact_get_by_account(ctx):
+    return lambda: ContactModel.get_by_account(ACCOUNT_ID)
+
+
+@benchmark('model.ContactModel.get_json_by_account')
+def bench_contact_get_json_by_account(ctx):
+    return lambda: ContactModel.get_json_by_account(ACCOUNT_ID)
+
+
+@benchmark('model.ContactModel.get_by_id')
+def bench_contact_get_by_id(ctx):
+    return lambda: ContactModel.get_by_id(ACCOUNT_ID, ctx.contact_ids[0])
+
+
+@benchmark('model.ContactModel.find_by_phone')
+def bench_find_by_phone(ctx):
+    return lambda: ContactModel.find_by_phone(ACCOUNT_ID, "0900001000", 5)
+
+
+@benchmark('model.ContactModel.find_by_name')
+def bench_find_by_name(ctx):
+    return lambda: ContactModel.find_by_name(ACCOUNT_ID, ctx.search_key, 5)
+
+
+@benchmark('model.ContactModel.find_by_prefix')
+def bench_find_by_prefix(ctx):
+    return lambda: ContactModel.find_by_prefix(ACCOUNT_ID, ctx.search_key[:2], 5)
+
+
+@benchmark('model.ContactModel.get_search_keys')
+def bench_get_search_keys(ctx):
+    return lambda: ContactModel.get_search_keys(ACCOUNT_ID)
+
+
+@benchmark('model.ContactModel.get_many')
+def bench_contact_get_many(ctx):
+    return lambda: ContactModel.get_many(ACCOUNT_ID, ctx.contact_ids)
+
+
+@benchmark('model.ContactModel.add + delete')
+def bench_contact_add_delete(ctx):
+    def run():
+        contact_id = ContactModel.add(WRITE_ACCOUNT_ID, "0912345678", "Bench", 1)
+        ContactModel.delete(WRITE_ACCOUNT_ID, contact_id)
+    return run
+
+
+# JSON rendering
+
+@benchmark('render.history page (dicts)')
+def bench_render_dicts(ctx):
+    rows = RequestModel.get_page(ACCOUNT_ID, 20)
+
+    def run():
+        return ctx.app.json.response({
+            'requests': [
+                {
+                    'request_id': request_id,
+                    'phone_number': phone_number,
+                    'amount': from_minor_units(amount),
+                    'status': status,
+                    'created_at': iso_from_ms(created_at)
+                }
+                for request_id, phone_number, amount, status, created_at in rows
+            ],
+            'next_cursor': None
+        })
+    return run
+
+
+@benchmark('render.history page (fragments)')
+def bench_render_fragments(ctx):
+    rows = [row[0] for row in RequestModel.get_page(ACCOUNT_ID, 20, as_json=True)]
+    return lambda: jsonify_fragments(requests=fragment_array(rows), next_cursor=None)
+
+
+# Whole routes through the test client
+
+@benchmark('route.GET /requests/')
+def bench_route_history(ctx):
+    return lambda: ctx.client.get('/requests/', headers=ctx.headers)
+
+
+@benchmark('route.GET /requests/status/<id>')
+def bench_route_status(ctx):
+    return lambda: ctx.client.get(f'/requests/status/{ctx.request_id}', headers=ctx.headers)
+
+
+@benchmark('route.GET /contacts/')
+def bench_route_contacts(ctx):
+    return lambda: ctx.client.get('/contacts/', headers=ctx.headers)
+
+
+@benchmark('route.GET /contacts/ (304)')
+def bench_route_contacts_304(ctx):
+    etag = ctx.client.get('/contacts/', headers=ctx.headers).headers['ETag']
+    headers = dict(ctx.headers, **{'If-None-Match': etag})
+    return lambda: ctx.client.get('/contacts/', headers=headers)
+
+
+@benchmark('route.POST /requests/')
+def bench_route_create(ctx):
+    body = {'phone_number': '0912345678', 'amount': 45}
+    return lambda: ctx.client.post('/requests/', json=body, headers=ctx.headers)
+
+
+def measure(func, min_time, rounds):
+    """Calibrate a loop count, then time `rounds` rounds; returns per-call statistics in microseconds"""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - start >= min_time / rounds:
+            break
+        loops *= 2
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops * 1e6)
+    return {
+        'median_us': statistics.median(samples),
+        'min_us': min(samples),
+        'stdev_us': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'loops': loops,
+        'rounds': rounds,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    ctx = Context(args.requests, args.accounts, args.contacts)
+    pattern = re.compile(args.filter) if args.filter else None
+    results = {}
+    for name, factory in BENCHMARKS:
+        if pattern and not pattern.search(name):
+            continue
+        # require_auth and the renderers need a request; the test client pushes its own
+        with ctx.app.test_request_context(headers=ctx.headers):
+            func = factory(ctx)
+            results[name] = measure(func, args.min_time, args.rounds)
+        print(f"{name:50}{results[name]['median_us']:>12.1f} us  (min {results[name]['min_us']:.1f})")
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'requests': args.requests,
+            'accounts': args.accounts,
+            'contacts': args.contacts,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold):
+    """
+    Print the change of every benchmark run in both; return the names that regressed
+
+    A benchmark regressed when both its median and its minimum got slower by
+    more than `threshold`, so a single noisy round does not fail the run.
+    """
+    print(f"baseline {baseline['meta'].get('commit')} ({baseline['meta']['timestamp']}) -> "
+          f"current {current['meta'].get('commit')} ({current['meta']['timestamp']})")
+    for key in ('python', 'sqlite', 'platform', 'requests', 'accounts', 'contacts'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"note: {key} differs ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+    print(f"{'benchmark':50}{'baseline':>12}{'current':>12}{'change':>9}")
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            print(f"{name:50}{'-':>12}{result['median_us']:>12.1f}{'new':>9}")
+            continue
+        change = result['median_us'] / before['median_us'] - 1
+        flag = ''
+        if change > threshold and result['min_us'] / before['min_us'] - 1 > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        elif change < -threshold:
+            flag = '  faster'
+        print(f"{name:50}{before['median_us']:>12.1f}{result['median_us']:>12.1f}{change:>+9.1%}{flag}")
+    print(f"{len(regressions)} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=100_000, help="requests in the database")
+    parser.add_argument('--accounts', type=int, default=100)
+    parser.add_argument('--contacts', type=int, default=5, help="contacts per account")
+    parser.add_argument('--filter', help="regular expression selecting benchmarks by name")
+    parser.add_argument('--min-time', type=float, default=0.5, help="seconds per benchmark")
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="compare the results with this earlier JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two stored runs without running anything")
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help="relative slowdown of the median reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            baseline = json.load(f)
+        with open(args.compare[1]) as f:
+            current = json.load(f)
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+    current = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print()
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Concurrency stress test for RequestService claims (single and batch)
+
+Creates a backlog of pending requests for one account, then lets several
+processes (each with several threads) claim them at the same time, the way
+multiple devices or gunicorn workers would. Fails if any request is handed
+out twice or if a request is left unclaimed.
+
+Usage (from the server directory):
+    python -m benchmarks.stress_claim [--requests 2000] [--processes 4] [--threads 8] [--batch 1]
+"""
+import argparse
+import multiprocessing
+import sys
+import threading
+from benchmarks.common import use_temp_database, timed
+
+use_temp_database()
+
+from database.models import init_db  # noqa: E402
+from services.request_service import RequestService  # noqa: E402
+
+ACCOUNT_ID = 1
+
+
+def claim_until_empty(threads, batch, results):
+    """Claim `batch` at a time from `threads` threads until the queue is drained"""
+    claimed = []
+    lock = threading.Lock()
+
+    def run():
+        while True:
+            rows = RequestService.claim_pending(ACCOUNT_ID, batch)
+            if not rows:
+                return
+            with lock:
+                claimed.extend(row[0] for row in rows)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put(claimed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--batch', type=int, default=1, help="requests claimed per call")
+    args = parser.parse_args()
+
+    init_db()
+    created = {RequestService.create_request(ACCOUNT_ID, "0912345678", 45) for _ in range(args.requests)}
+
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=claim_until_empty, args=(args.threads, args.batch, results))
+        for _ in range(args.processes)
+    ]
+
+    def run_all():
+        for process in processes:
+            process.start()
+        claimed = [request_id for _ in processes for request_id in results.get()]
+        for process in processes:
+            process.join()
+        return claimed
+
+    claimed, elapsed = timed(run_all)
+    duplicates = len(claimed) - len(set(claimed))
+    missing = created - set(claimed)
+
+    print(f"claimed {len(claimed)} of {len(created)} requests in {elapsed:.2f}s "
+          f"({len(claimed) / elapsed:.0f} claims/s) "
+          f"with {args.processes} processes x {args.threads} threads")
+    print(f"duplicates: {duplicates}, unclaimed: {len(missing)}")
+    if duplicates or missing:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,96 @@
+import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent
-DB_NAME = str((BASE_DIR / "db.sqlite3").resolve())
-MAX_CONTACTS_PER_ACCOUNT = 5
\ No newline at end of file
+DB_NAME = os.getenv('DB_NAME', str((BASE_DIR / "db.sqlite3").resolve()))
+MAX_CONTACTS_PER_ACCOUNT = int(os.getenv('MAX_CONTACTS_PER_ACCOUNT', 5))
+
+# SQLite connection pool (one pool per worker process)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
+# SQLite PRAGMAs applied to every pooled connection
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 16384))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', 134217728))
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))
+
+# Long polling on GET /requests/next?wait=N
+LONG_POLL_MAX_WAIT = int(os.getenv('LONG_POLL_MAX_WAIT', 25))
+LONG_POLL_RECHECK_SECONDS = float(os.getenv('LONG_POLL_RECHECK_SECONDS', 5))
+
+# Server-Sent Events stream on GET /requests/stream
+SSE_BATCH_SIZE = int(os.getenv('SSE_BATCH_SIZE', 100))
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+SSE_MAX_DURATION = float(os.getenv('SSE_MAX_DURATION', 300))
+SSE_RETRY_MS = int(os.getenv('SSE_RETRY_MS', 3000))
+
+# In-process pending index: how long an empty account is trusted without a database check
+PENDING_INDEX_MAX_AGE = float(os.getenv('PENDING_INDEX_MAX_AGE', 30))
+
+# Batch claim on GET /requests/next?limit=N
+CLAIM_BATCH_MAX = int(os.getenv('CLAIM_BATCH_MAX', 50))
+
+# Bulk creation on POST /requests/batch
+REQUEST_BATCH_MAX = int(os.getenv('REQUEST_BATCH_MAX', 500))
+
+# Bulk result reporting on POST /requests/results/batch
+RESULT_BATCH_MAX = int(os.getenv('RESULT_BATCH_MAX', 500))
+
+# Claim leases and the background reaper
+LEASE_SECONDS = int(os.getenv('LEASE_SECONDS', 300))
+MAX_ATTEMPTS = int(os.getenv('MAX_ATTEMPTS', 3))
+REAPER_INTERVAL_SECONDS = float(os.getenv('REAPER_INTERVAL_SECONDS', 30))
+REAPER_BATCH_SIZE = int(os.getenv('REAPER_BATCH_SIZE', 500))
+
+# Request history on GET /requests/
+HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+HISTORY_PAGE_MAX = int(os.getenv('HISTORY_PAGE_MAX', 100))
+
+# Retention: finished requests move to the archive database
+ARCHIVE_DB_NAME = os.getenv('ARCHIVE_DB_NAME', str((BASE_DIR / "archive.sqlite3").resolve()))
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 90))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', 500))
+RETENTION_INTERVAL_SECONDS = float(os.getenv('RETENTION_INTERVAL_SECONDS', 3600))
+RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', 2000))
+
+# Verified JWT cache in utils/auth.py (0 disables caching)
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 4096))
+
+# Cross-worker change log (utils/coherence.py)
+COHERENCE_POLL_SECONDS = float(os.getenv('COHERENCE_POLL_SECONDS', 0.25))
+CHANGE_LOG_SECONDS = int(os.getenv('CHANGE_LOG_SECONDS', 600))
+CHANGE_PRUNE_SECONDS = float(os.getenv('CHANGE_PRUNE_SECONDS', 60))
+
+# Contact resolution on GET /contacts/resolve
+RESOLVE_LIMIT = int(os.getenv('RESOLVE_LIMIT', 5))
+RESOLVE_LIMIT_MAX = int(os.getenv('RESOLVE_LIMIT_MAX', 20))
+RESOLVE_FUZZY_MAX_DISTANCE = int(os.getenv('RESOLVE_FUZZY_MAX_DISTANCE', 2))
+RESOLVE_CACHE_ACCOUNTS = int(os.getenv('RESOLVE_CACHE_ACCOUNTS', 256))
+
+# Response encoding: JSON provider ("orjson" falls back to "stdlib" when the
+# package is missing) and compression of bodies of at least COMPRESS_MIN_BYTES
+JSON_PROVIDER = os.getenv('JSON_PROVIDER', 'orjson')
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+
+# Prometheus metrics on GET /metrics (utils/metrics.py); every worker process
+# writes its metrics to METRICS_DIR, which must be shared by all of them
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'easytransfer-metrics'))
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+# /metrics lists accounts and their queue sizes, so it is refused unless a
+# token is set or METRICS_PUBLIC explicitly opens it (e.g. behind a private network)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'false').lower() == 'true'
+
+# Statement profiling in database/profiler.py and the slow-query log, off by
+# default because it times every statement; the top statements are served by
+# GET /admin/queries to ADMIN_ACCOUNT_IDS
+DB_PROFILE = os.getenv('DB_PROFILE', 'false').lower() == 'true'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+PROFILE_MAX_STATEMENTS = int(os.getenv('PROFILE_MAX_STATEMENTS', 500))
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', 20))
+ADMIN_ACCOUNT_IDS = {int(account_id) for account_id in os.getenv('ADMIN_ACCOUNT_IDS', '').split(',') if account_id.strip()}
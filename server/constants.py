@@ -2,11 +2,23 @@
 Application constants and error messages
 """
 
+# Error Messages - Request bodies
+ERROR_BODY_REQUIRED = "Request body is required"
+
 # Error Messages - Requests
 
 ERROR_MISSING_REQUIRED_FIELDS_REQUEST = "الحقول phone_number و amount مطلوبة"
 ERROR_INVALID_STATUS = "الحالة يجب أن تكون Success أو Failed"
 ERROR_REQUEST_NOT_FOUND = "الطلب غير موجود"
+ERROR_INVALID_LIMIT = "قيمة limit يجب أن تكون عدداً صحيحاً موجباً"
+ERROR_BATCH_REQUIRED = "قائمة الطلبات requests مطلوبة"
+ERROR_BATCH_TOO_LARGE = "عدد الطلبات كبير جداً. الحد الأقصى {limit} طلب في الدفعة الواحدة"
+ERROR_RESULTS_BATCH_REQUIRED = "قائمة النتائج results مطلوبة"
+ERROR_INVALID_CURSOR = "قيمة cursor غير صالحة"
+ERROR_INVALID_STATUS_FILTER = "قيمة status يجب أن تكون من: Pending, Processing, Done, Failed"
+ERROR_STALE_LEASE = "انتهت صلاحية حجز هذا الطلب أو أعيد إسناده، تم تجاهل النتيجة"
+ERROR_INVALID_LEASE_TOKEN = "lease_token يجب أن يكون عدداً صحيحاً"
+ERROR_RESULTS_BATCH_TOO_LARGE = "عدد النتائج كبير جداً. الحد الأقصى {limit} نتيجة في الدفعة الواحدة"
 
 # Error Messages - Contacts
 ERROR_MISSING_REQUIRED_FIELDS_CONTACT = "رقم الهاتف والاسم مطلوبان"
@@ -17,11 +29,19 @@ ERROR_NAME_TOO_LONG = "الاسم يجب أن يكون 50 حرف أو أقل"
 ERROR_NAME_IS_DIGIT = "الاسم يجب أن يحتوي على حروف"
 ERROR_CONTACT_NOT_FOUND = "جهة الاتصال غير موجودة"
 ERROR_CONTACT_PERMISSION_DENIED = "يمكنك فقط حذف جهات الاتصال الخاصة بك"
+ERROR_RESOLVE_QUERY_REQUIRED = "يجب إدخال اسم أو رقم هاتف للبحث"
 
 # Success Messages
 SUCCESS_CONTACT_ADDED = "تمت إضافة جهة الاتصال بنجاح"
 SUCCESS_CONTACT_DELETED = "تم حذف جهة الاتصال بنجاح"
 
+# Contact resolution match kinds, best first
+MATCH_PHONE = "phone"
+MATCH_EXACT = "exact"
+MATCH_NORMALIZED = "normalized"
+MATCH_PREFIX = "prefix"
+MATCH_FUZZY = "fuzzy"
+
 # Status Messages
 STATUS_PONG = "pong"
 STATUS_OK = "ok"
@@ -31,12 +51,28 @@ STATUS_PROCESSING = "Processing"
 STATUS_DONE = "Done"
 STATUS_FAILED = "Failed"
 STATUS_SUCCESS = "Success"
+REQUEST_STATUSES = (STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED)
 MESSAGE_NO_PENDING_REQUESTS = "لا توجد طلبات معلقة"
 
+# Result Reporting Outcomes
+RESULT_RECORDED = "recorded"
+RESULT_DUPLICATE = "duplicate"
+RESULT_NOT_FOUND = "not_found"
+RESULT_STALE = "stale"
+
+# Change-log topics shared between worker processes
+CHANGE_PENDING = "pending"
+CHANGE_CONTACTS = "contacts"
+
 # JWT Authentication Error Messages
 ERROR_TOKEN_NOT_PROVIDED = "رمز المصادقة مطلوب"
 ERROR_INVALID_TOKEN = "رمز المصادقة غير صالح أو منتهي الصلاحية"
+ERROR_ADMIN_ONLY = "هذه العملية متاحة للمسؤولين فقط"
+ERROR_METRICS_DISABLED = "المقاييس غير مفعلة. يجب ضبط METRICS_TOKEN"
 
 # Validation Constants
 MAX_PHONE_NUMBER_LENGTH = 14
 MAX_NAME_LENGTH = 50
+
+# Amounts are stored in minor units (1/100 of the currency unit)
+AMOUNT_SCALE = 100
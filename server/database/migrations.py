@@ -0,0 +1,227 @@
+"""
+Versioned schema migrations
+
+The schema version lives in SQLite's ``PRAGMA user_version``. Each
+migration is applied at most once, in order, inside the same
+BEGIN IMMEDIATE transaction as ``init_db`` so that several gunicorn
+workers starting together cannot apply the same step twice.
+
+A step is either an SQL string or a callable taking the cursor.
+"""
+from datetime import datetime, timezone
+from constants import AMOUNT_SCALE
+from utils.names import normalize_name, search_key, phone_key
+
+# ISO-8601 TEXT -> epoch milliseconds, evaluated by SQLite during a table rebuild
+_ISO_TO_MS = "CAST(round((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def _rebuild_table(cursor, table, create_sql, select_sql):
+    """
+    Rebuild `table` with a new definition, copying rows through `select_sql`
+
+    Follows SQLite's documented table-rebuild procedure: indexes are
+    recreated from sqlite_master and the AUTOINCREMENT counter is carried
+    over so ids are never reused.
+    """
+    cursor.execute(
+        "SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+        (table,)
+    )
+    indexes = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name=?", (table,))
+    sequence = cursor.fetchone()
+
+    cursor.execute(create_sql.format(table=f"{table}_new"))
+    cursor.execute(f"INSERT INTO {table}_new {select_sql}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    for index_sql in indexes:
+        cursor.execute(index_sql)
+    if sequence:
+        cursor.execute("UPDATE sqlite_sequence SET seq=max(seq, ?) WHERE name=?", (sequence[0], table))
+        if not cursor.rowcount:
+            cursor.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, sequence[0]))
+
+
+def _use_integer_units(cursor):
+    """Store timestamps as epoch milliseconds and amounts as integer minor units"""
+    _rebuild_table(cursor, "requests", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'Pending',
+            created_at INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at INTEGER
+        )
+        """, f"""
+        SELECT id, account_id, phone_number, CAST(round(amount * {AMOUNT_SCALE}) AS INTEGER), status,
+               {_ISO_TO_MS.format(column='created_at')}, attempts,
+               {_ISO_TO_MS.format(column='lease_expires_at')}
+        FROM requests
+        """)
+    _rebuild_table(cursor, "results", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            request_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at INTEGER NOT NULL,
+            FOREIGN KEY (request_id) REFERENCES requests (id)
+        )
+        """, f"""
+        SELECT id, account_id, request_id, status, message, {_ISO_TO_MS.format(column='created_at')}
+        FROM results
+        """)
+    _rebuild_table(cursor, "contacts", """
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL CHECK(length(phone_number) <= 14),
+            name VARCHAR(50) NOT NULL,
+            date_added INTEGER NOT NULL
+        )
+        """, f"""
+        SELECT id, account_id, phone_number, name, {_ISO_TO_MS.format(column='date_added')}
+        FROM contacts
+        """)
+
+
+def _fill_normalized_names(cursor):
+    """
+    Compute contacts.name_normalized in Python, where lower() handles non-ASCII
+
+    Duplicates that slipped past the old check-then-insert keep their name;
+    every copy after the oldest gets its id appended to the normalized key
+    so the unique index can be created.
+    """
+    cursor.execute("SELECT id, account_id, name FROM contacts ORDER BY id")
+    seen = set()
+    updates = []
+    for contact_id, account_id, name in cursor.fetchall():
+        key = normalize_name(name)
+        if (account_id, key) in seen:
+            key = f"{key}#{contact_id}"
+        seen.add((account_id, key))
+        updates.append((key, contact_id))
+    cursor.executemany("UPDATE contacts SET name_normalized=? WHERE id=?", updates)
+
+
+def _fill_search_keys(cursor):
+    """Compute contacts.name_search and phone_search in Python (see utils/names.py)"""
+    cursor.execute("SELECT id, name, phone_number FROM contacts")
+    cursor.executemany(
+        "UPDATE contacts SET name_search=?, phone_search=? WHERE id=?",
+        [(search_key(name), phone_key(phone_number), contact_id)
+         for contact_id, name, phone_number in cursor.fetchall()]
+    )
+
+
+MIGRATIONS = [
+    (1, "Composite indexes for the hot queries", [
+        "CREATE INDEX IF NOT EXISTS idx_requests_account_status_created "
+        "ON requests (account_id, status, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_requests_account_created "
+        "ON requests (account_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_results_request "
+        "ON results (request_id)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_account_name "
+        "ON contacts (account_id, name)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_account_date_added "
+        "ON contacts (account_id, date_added)",
+    ]),
+    (2, "Index pending requests by id for the SSE stream", [
+        "CREATE INDEX IF NOT EXISTS idx_requests_account_status_id "
+        "ON requests (account_id, status, id)",
+    ]),
+    (3, "Claim leases, attempt counter and the reaper index", [
+        "ALTER TABLE requests ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE requests ADD COLUMN lease_expires_at TEXT",
+        # Requests stuck in Processing before leases existed count as one
+        # attempt whose lease has already run out
+        lambda c: c.execute(
+            "UPDATE requests SET attempts=1, lease_expires_at=? WHERE status='Processing'",
+            (datetime.now(timezone.utc).isoformat(),)
+        ),
+        "CREATE INDEX IF NOT EXISTS idx_requests_status_lease "
+        "ON requests (status, lease_expires_at)",
+    ]),
+    (4, "Integer epoch-millisecond timestamps and integer minor-unit amounts", [
+        _use_integer_units,
+    ]),
+    (5, "Index finished requests by age for retention", [
+        "CREATE INDEX IF NOT EXISTS idx_requests_status_created "
+        "ON requests (status, created_at)",
+    ]),
+    (6, "Change log read by the other worker processes", [
+        """
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic TEXT NOT NULL,
+            account_id INTEGER NOT NULL,
+            origin INTEGER NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+        """,
+    ]),
+    (7, "Unique normalized contact name per account", [
+        "ALTER TABLE contacts ADD COLUMN name_normalized TEXT",
+        _fill_normalized_names,
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_account_name_normalized "
+        "ON contacts (account_id, name_normalized)",
+        # Superseded by the unique index above
+        "DROP INDEX IF EXISTS idx_contacts_account_name",
+    ]),
+    (8, "Search keys for resolving contacts by name or phone", [
+        "ALTER TABLE contacts ADD COLUMN name_search TEXT",
+        "ALTER TABLE contacts ADD COLUMN phone_search TEXT",
+        _fill_search_keys,
+        "CREATE INDEX IF NOT EXISTS idx_contacts_account_name_search "
+        "ON contacts (account_id, name_search)",
+        "CREATE INDEX IF NOT EXISTS idx_contacts_account_phone_search "
+        "ON contacts (account_id, phone_search)",
+    ]),
+    (9, "Per-account contacts version for ETags", [
+        """
+        CREATE TABLE IF NOT EXISTS contact_versions (
+            account_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """,
+    ]),
+    (10, "Index requests by status and account for the queue-depth gauge", [
+        "CREATE INDEX IF NOT EXISTS idx_requests_status_account "
+        "ON requests (status, account_id)",
+    ]),
+    # A sixth index on requests costs every insert and status change; the
+    # gauge groups the live rows found through idx_requests_status_created
+    (11, "Drop the queue-depth index", [
+        "DROP INDEX IF EXISTS idx_requests_status_account",
+    ]),
+]
+
+
+def get_version(cursor):
+    """Return the schema version recorded in the database"""
+    cursor.execute("PRAGMA user_version")
+    return cursor.fetchone()[0]
+
+
+def migrate(cursor):
+    """Apply every migration newer than the recorded schema version"""
+    version = get_version(cursor)
+    for target, description, steps in MIGRATIONS:
+        if target <= version:
+            continue
+        for step in steps:
+            if callable(step):
+                step(cursor)
+            else:
+                cursor.execute(step)
+        cursor.execute(f"PRAGMA user_version={target:d}")
+        version = target
+    return version
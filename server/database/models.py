@@ -1,32 +1,109 @@
-import sqlite3
-from config import DB_NAME
-from constants import STATUS_PENDING
-from datetime import datetime, timezone
+import os
+import sys
+import time
+from database.pool import connect, get_pool
+from database.migrations import migrate
+from database.profiler import query_profiler
+from config import DB_NAME, ARCHIVE_DB_NAME
+from constants import (
+    STATUS_PENDING,
+    STATUS_PROCESSING,
+    STATUS_DONE,
+    STATUS_FAILED,
+    RESULT_RECORDED,
+    RESULT_DUPLICATE,
+    RESULT_NOT_FOUND,
+    RESULT_STALE,
+    CHANGE_PENDING,
+    CHANGE_CONTACTS,
+    AMOUNT_SCALE,
+)
+from utils.metrics import metrics
+from utils.units import now_ms
+from utils.names import normalize_name, search_key, phone_key
+
+
+def iso_sql(column):
+    """SQL rendering of an epoch-ms column, identical to utils.units.iso_from_ms"""
+    return (f"strftime('%Y-%m-%dT%H:%M:%S', {column} / 1000, 'unixepoch') "
+            f"|| printf('.%03d+00:00', {column} % 1000)")
+
+
+# API representations rendered by SQLite, members in the sorted order the
+# JSON provider writes, so list endpoints never build a dict per row
+REQUEST_JSON = (
+    f"json_object('amount', amount * 1.0 / {AMOUNT_SCALE}, 'created_at', {iso_sql('created_at')}, "
+    "'phone_number', phone_number, 'request_id', id, 'status', status)"
+)
+CONTACT_JSON = (
+    f"json_object('date_added', {iso_sql('date_added')}, 'id', id, 'name', name, "
+    "'phone_number', phone_number)"
+)
 
 
 class Database:
-    """Database connection context manager"""
+    """Database connection context manager backed by the connection pool"""
     
-    def __init__(self):
+    def __init__(self, immediate=False, path=DB_NAME):
+        self.immediate = immediate
+        self.path = path
         self.conn = None
         self.cursor = None
+        self.operation = None
+        self.waited = None
+        self.started = None
+        self.trace = None
     
     def __enter__(self):
-        self.conn = sqlite3.connect(DB_NAME)
-        self.cursor = self.conn.cursor()
+        # Timed per block under the name of the model method that opened it
+        self.operation = sys._getframe(1).f_code.co_qualname
+        requested = time.perf_counter()
+        pool = get_pool(self.path)
+        self.conn = pool.acquire()
+        self.started = time.perf_counter()
+        self.waited = self.started - requested
+        self.cursor, self.trace = query_profiler.cursor(self.conn, self.operation)
+        if self.immediate:
+            # Take the write lock up front so read-then-write blocks are atomic
+            try:
+                self.cursor.execute("BEGIN IMMEDIATE")
+            except Exception:
+                # __exit__ is not called when __enter__ fails
+                self.cursor.close()
+                self._record()
+                pool.release(self.conn)
+                raise
         return self.cursor
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_type is None:
-            self.conn.commit()
-        else:
-            self.conn.rollback()
-        self.conn.close()
+        pool = get_pool(self.path)
+        self.cursor.close()
+        try:
+            if exc_type is None:
+                if self.trace is not None:
+                    self.trace.statement("COMMIT")
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        except Exception:
+            self._record()
+            pool.discard(self.conn)
+            raise
+        self._record()
+        pool.release(self.conn)
+
+    def _record(self):
+        elapsed = time.perf_counter() - self.started
+        labels = (('operation', self.operation),)
+        metrics.observe('easytransfer_db_wait_seconds', labels, self.waited)
+        metrics.observe('easytransfer_db_query_duration_seconds', labels, elapsed)
+        if self.trace is not None:
+            query_profiler.finish(self.conn, self.trace, self.waited, elapsed)
 
 
 def init_db():
-    """Initialize database tables"""
-    with Database() as c:
+    """Initialize database tables and apply pending migrations"""
+    with Database(immediate=True) as c:
         c.execute("""
         CREATE TABLE IF NOT EXISTS requests (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -60,102 +137,580 @@ def init_db():
         )
         """)
 
+        migrate(c)
+
+    init_archive_db()
+
+
+def init_archive_db():
+    """Initialize the archive database that retention moves finished requests into"""
+    with Database(immediate=True, path=ARCHIVE_DB_NAME) as c:
+        # Same columns as the live tables; ids are copied, never generated here
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS requests (
+            id INTEGER PRIMARY KEY,
+            account_id INTEGER NOT NULL,
+            phone_number TEXT NOT NULL,
+            amount INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_expires_at INTEGER
+        )
+        """)
+
+        c.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY,
+            account_id INTEGER NOT NULL,
+            request_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            message TEXT,
+            created_at INTEGER NOT NULL
+        )
+        """)
+
+        c.execute("CREATE INDEX IF NOT EXISTS idx_results_request ON results (request_id)")
+
+
+def record_change(cursor, topic, account_id):
+    """
+    Append to the change log inside the caller's transaction
+
+    Other worker processes read the log to invalidate their in-process
+    state; the writing process is recorded as the origin so it can skip
+    its own changes.
+    """
+    cursor.execute(
+        "INSERT INTO changes (topic, account_id, origin, created_at) VALUES (?, ?, ?, ?)",
+        (topic, account_id, os.getpid(), now_ms())
+    )
+
 
 class RequestModel:
     """Request database operations"""
-    
+
+    # Statements shared with database/query_plans.py, which checks their plans
+    INSERT_SQL = "INSERT INTO requests (account_id, phone_number, amount, created_at) VALUES (?, ?, ?, ?)"
+    # The unary + keeps the outer status check off every status-leading index,
+    # so the UPDATE looks the claimed ids up by rowid instead of walking all
+    # pending rows of every account
+    CLAIM_SQL = """
+        UPDATE requests SET status=?, attempts=attempts + 1, lease_expires_at=?
+        WHERE id IN (
+            SELECT id FROM requests WHERE status=? AND account_id=?
+            ORDER BY created_at ASC, id ASC LIMIT ?
+        ) AND +status=?
+        RETURNING id, phone_number, amount, attempts, created_at
+    """
+    FAIL_EXPIRED_SQL = """
+        UPDATE requests SET status=?, lease_expires_at=NULL
+        WHERE id IN (
+            SELECT id FROM requests WHERE status=? AND lease_expires_at<? AND attempts>=? LIMIT ?
+        )
+    """
+    REQUEUE_EXPIRED_SQL = """
+        UPDATE requests SET status=?, lease_expires_at=NULL
+        WHERE id IN (
+            SELECT id FROM requests WHERE status=? AND lease_expires_at<? LIMIT ?
+        )
+        RETURNING id, account_id, created_at
+    """
+    ALL_PENDING_SQL = "SELECT account_id, id, created_at FROM requests WHERE status=?"
+    COUNT_ACTIVE_SQL = (
+        "SELECT account_id, status, COUNT(*) FROM requests WHERE status IN (?, ?) GROUP BY account_id, status"
+    )
+    PENDING_AFTER_SQL = (
+        "SELECT id, phone_number, amount, created_at FROM requests WHERE account_id=? AND status=? AND id>? "
+        "ORDER BY id ASC LIMIT ?"
+    )
+    BY_ID_SQL = "SELECT id, phone_number, amount, status, attempts FROM requests WHERE id=? AND account_id=?"
+    BY_ACCOUNT_SQL = (
+        "SELECT id, phone_number, amount, status, created_at FROM requests WHERE account_id=? "
+        "ORDER BY created_at DESC"
+    )
+    UPDATE_STATUS_SQL = "UPDATE requests SET status=? WHERE id=? AND account_id=?"
+
     @staticmethod
     def add(account_id, phone_number, amount):
+        """
+        Insert a request; `amount` is in minor units
+
+        Returns:
+            tuple: (id, created_at)
+        """
         with Database() as c:
-            created_at = datetime.now(timezone.utc).isoformat()
+            created_at = now_ms()
 
             c.execute(
-                "INSERT INTO requests (account_id, phone_number, amount, created_at) VALUES (?, ?, ?, ?)",
+                RequestModel.INSERT_SQL,
                 (account_id, phone_number, amount, created_at)
             )
-            return c.lastrowid
+            request_id = c.lastrowid
+            record_change(c, CHANGE_PENDING, account_id)
+            return request_id, created_at
 
     @staticmethod
-    def get_next(account_id):
-        with Database() as c:
+    def add_many(account_id, items):
+        """
+        Insert (phone_number, amount in minor units) pairs in one transaction
+
+        Returns:
+            tuple: (ids in input order, created_at shared by all of them)
+        """
+        with Database(immediate=True) as c:
+            created_at = now_ms()
+            c.executemany(
+                RequestModel.INSERT_SQL,
+                [(account_id, phone_number, amount, created_at) for phone_number, amount in items]
+            )
+            # The write lock is held, so AUTOINCREMENT handed out a consecutive block of ids
+            c.execute("SELECT last_insert_rowid()")
+            last_id = c.fetchone()[0]
+            record_change(c, CHANGE_PENDING, account_id)
+            return list(range(last_id - len(items) + 1, last_id + 1)), created_at
+
+    @staticmethod
+    def claim(account_id, limit, lease_seconds):
+        """
+        Atomically lease up to `limit` oldest pending requests and return them oldest first
+
+        Each claim bumps the request's attempt counter, which doubles as the
+        fencing token a result must echo back.
+
+        Returns:
+            list: (id, phone_number, amount, lease_token) tuples
+        """
+        with Database(immediate=True) as c:
+            lease_expires_at = now_ms() + lease_seconds * 1000
             c.execute(
-                "SELECT id, phone_number, amount FROM requests WHERE status=? AND account_id=? ORDER BY created_at ASC LIMIT 1",
-                (STATUS_PENDING, account_id)
+                RequestModel.CLAIM_SQL,
+                (STATUS_PROCESSING, lease_expires_at, STATUS_PENDING, account_id, limit, STATUS_PENDING)
             )
-            return c.fetchone()
+            rows = c.fetchall()
+        # RETURNING does not guarantee any order
+        rows.sort(key=lambda row: (row[4], row[0]))
+        return [row[:4] for row in rows]
 
     @staticmethod
-    def get_by_id(account_id, request_id):
+    def reap_expired_leases(max_attempts, limit):
+        """
+        Requeue processing requests whose lease ran out, failing those out of attempts
+
+        At most `limit` rows of each kind are touched per call so the write
+        lock is only held briefly.
+
+        Returns:
+            tuple: ((id, account_id, created_at) of every requeued request, number of requests failed)
+        """
+        with Database(immediate=True) as c:
+            now = now_ms()
+            c.execute(
+                RequestModel.FAIL_EXPIRED_SQL,
+                (STATUS_FAILED, STATUS_PROCESSING, now, max_attempts, limit)
+            )
+            failed = c.rowcount
+            c.execute(
+                RequestModel.REQUEUE_EXPIRED_SQL,
+                (STATUS_PENDING, STATUS_PROCESSING, now, limit)
+            )
+            requeued = c.fetchall()
+            for account_id in {row[1] for row in requeued}:
+                record_change(c, CHANGE_PENDING, account_id)
+        return requeued, failed
+
+    @staticmethod
+    def get_all_pending():
+        """Get (account_id, id, created_at) of every pending request"""
+        with Database() as c:
+            c.execute(RequestModel.ALL_PENDING_SQL, (STATUS_PENDING,))
+            return c.fetchall()
+
+    @staticmethod
+    def count_active():
+        """
+        Get (account_id, status, count) of pending and processing requests
+
+        Walks only the live rows through idx_requests_status_created and
+        groups them in a temporary b-tree, which stays as small as the backlog.
+        """
+        with Database() as c:
+            c.execute(RequestModel.COUNT_ACTIVE_SQL, (STATUS_PENDING, STATUS_PROCESSING))
+            return c.fetchall()
+
+    @staticmethod
+    def get_pending_after(account_id, last_id, limit):
+        """Get pending requests with an id greater than last_id, oldest first"""
         with Database() as c:
             c.execute(
-                "SELECT id, phone_number, amount, status FROM requests WHERE id=? AND account_id=?",
-                (request_id, account_id)
+                RequestModel.PENDING_AFTER_SQL,
+                (account_id, STATUS_PENDING, last_id, limit)
             )
+            return c.fetchall()
+
+    @staticmethod
+    def get_by_id(account_id, request_id):
+        with Database() as c:
+            c.execute(RequestModel.BY_ID_SQL, (request_id, account_id))
             return c.fetchone()
 
     @staticmethod
     def get_by_account(account_id):
         with Database() as c:
-            c.execute(
-                "SELECT id, phone_number, amount, status, created_at FROM requests WHERE account_id=? ORDER BY created_at DESC",
-                (account_id,)
-            )
+            c.execute(RequestModel.BY_ACCOUNT_SQL, (account_id,))
+            return c.fetchall()
+
+    @staticmethod
+    def page_query(account_id, limit, after=None, statuses=None, as_json=False):
+        """
+        Build the (sql, params) of one get_page call
+
+        Each status gets its own arm walking idx_requests_account_status_created
+        in order, and SQLite merges the arms, so filtering by several statuses
+        still reads at most `limit` rows per status; ``status IN (...)``
+        would walk the account's whole history instead.
+        """
+        columns = f"{REQUEST_JSON}, created_at, id" if as_json else "id, phone_number, amount, status, created_at"
+        where = "account_id=?"
+        params = [account_id]
+        if after is not None:
+            where += " AND (created_at, id) < (?, ?)"
+            params.extend(after)
+
+        if not statuses:
+            sql = f"SELECT {columns} FROM requests WHERE {where}"
+            params.append(limit)
+        else:
+            statuses = list(dict.fromkeys(statuses))
+            sql = " UNION ALL ".join([f"SELECT {columns} FROM requests WHERE {where} AND status=?"] * len(statuses))
+            params = [value for status in statuses for value in (*params, status)] + [limit]
+        return f"{sql} ORDER BY created_at DESC, id DESC LIMIT ?", params
+
+    @staticmethod
+    def get_page(account_id, limit, after=None, statuses=None, as_json=False):
+        """
+        Get one page of an account's requests, newest first, by keyset
+
+        `after` is the (created_at, id) of the last row of the previous page,
+        so each page is a bounded index range scan regardless of how deep
+        into the history it is. With `as_json` each row is (JSON object,
+        created_at, id) instead of the raw columns.
+        """
+        with Database() as c:
+            c.execute(*RequestModel.page_query(account_id, limit, after, statuses, as_json))
             return c.fetchall()
 
     @staticmethod
     def update_status(account_id, request_id, status):
         with Database() as c:
-            c.execute(
-                "UPDATE requests SET status=? WHERE id=? AND account_id=?",
-                (status, request_id, account_id)
-            )
+            c.execute(RequestModel.UPDATE_STATUS_SQL, (status, request_id, account_id))
 
 
 class ResultModel:
     """Result database operations"""
-    
+
+    REQUEST_STATE_SQL = "SELECT status, attempts FROM requests WHERE id=? AND account_id=?"
+
     @staticmethod
-    def add(account_id, request_id, status, message):
+    def record_many(account_id, results):
+        """
+        Store results and move their requests to a final status in one transaction
+
+        `results` holds (request_id, status, final_status, message, lease_token)
+        tuples. A request that already reached a final status is left
+        untouched, which makes replaying the same results safe. When a lease
+        token is given, the result is only accepted while the request is
+        still processing under that same lease.
+
+        Returns:
+            list: (RESULT_RECORDED | RESULT_DUPLICATE | RESULT_NOT_FOUND | RESULT_STALE, request status) per item
+        """
+        outcomes = []
+        with Database(immediate=True) as c:
+            created_at = now_ms()
+            for request_id, status, final_status, message, lease_token in results:
+                c.execute(ResultModel.REQUEST_STATE_SQL, (request_id, account_id))
+                row = c.fetchone()
+                if row is None:
+                    outcomes.append((RESULT_NOT_FOUND, None))
+                    continue
+                if row[0] in (STATUS_DONE, STATUS_FAILED):
+                    outcomes.append((RESULT_DUPLICATE, row[0]))
+                    continue
+                if lease_token is not None and (row[0] != STATUS_PROCESSING or row[1] != lease_token):
+                    outcomes.append((RESULT_STALE, row[0]))
+                    continue
+
+                c.execute(
+                    "INSERT INTO results (account_id, request_id, status, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (account_id, request_id, status, message, created_at)
+                )
+                c.execute(
+                    "UPDATE requests SET status=?, lease_expires_at=NULL WHERE id=? AND account_id=?",
+                    (final_status, request_id, account_id)
+                )
+                outcomes.append((RESULT_RECORDED, final_status))
+        return outcomes
+
+
+class ChangeModel:
+    """Change log operations"""
+
+    AFTER_SQL = "SELECT seq, topic, account_id, origin FROM changes WHERE seq>? ORDER BY seq ASC LIMIT ?"
+
+    @staticmethod
+    def last_seq():
+        """Get the newest sequence number ever handed out, even if pruned since"""
         with Database() as c:
-            created_at = datetime.now(timezone.utc).isoformat()
+            c.execute("SELECT seq FROM sqlite_sequence WHERE name='changes'")
+            row = c.fetchone()
+            return row[0] if row else 0
+
+    @staticmethod
+    def get_after(seq, limit):
+        """Get (seq, topic, account_id, origin) of changes after `seq`, oldest first"""
+        with Database() as c:
+            c.execute(ChangeModel.AFTER_SQL, (seq, limit))
+            return c.fetchall()
+
+    @staticmethod
+    def prune(before):
+        """Delete changes recorded before `before` (epoch ms)"""
+        with Database() as c:
+            # seq grows with created_at, so this walks only the rows it deletes
+            c.execute(
+                """
+                DELETE FROM changes WHERE seq < COALESCE(
+                    (SELECT seq FROM changes WHERE created_at>=? ORDER BY seq ASC LIMIT 1),
+                    (SELECT MAX(seq) + 1 FROM changes)
+                )
+                """,
+                (before,)
+            )
+            return c.rowcount
+
+
+class ArchiveModel:
+    """Moves finished requests into the archive database and reads them back"""
+
+    REQUEST_COLUMNS = "id, account_id, phone_number, amount, status, created_at, attempts, lease_expires_at"
+    RESULT_COLUMNS = "id, account_id, request_id, status, message, created_at"
+    FINISHED_SQL = "SELECT id FROM requests WHERE status IN (?, ?) AND created_at<? LIMIT ?"
+
+    @staticmethod
+    def archive_finished(before, limit):
+        """
+        Move up to `limit` Done/Failed requests created before `before`, with their results
+
+        Rows are copied into the archive and committed there first, then
+        deleted from the live database in a second short transaction that
+        only removes what the archive already holds. A crash in between
+        leaves a request in both databases, which the next run resolves,
+        but never in neither.
+
+        Returns:
+            int: number of requests moved
+        """
+        # ATTACH cannot run inside a transaction and would leak into pooled
+        # connections, so the move uses its own short-lived connection
+        conn = connect(DB_NAME)
+        try:
+            conn.execute("ATTACH DATABASE ? AS archive", (ARCHIVE_DB_NAME,))
+            c = conn.cursor()
             c.execute(
-                "INSERT INTO results (account_id, request_id, status, message, created_at) VALUES (?, ?, ?, ?, ?)",
-                (account_id, request_id, status, message, created_at)
+                ArchiveModel.FINISHED_SQL,
+                (STATUS_DONE, STATUS_FAILED, before, limit)
             )
+            ids = [row[0] for row in c.fetchall()]
+            if not ids:
+                return 0
+            placeholders = ', '.join('?' * len(ids))
+
+            c.execute(
+                f"INSERT OR IGNORE INTO archive.requests ({ArchiveModel.REQUEST_COLUMNS}) "
+                f"SELECT {ArchiveModel.REQUEST_COLUMNS} FROM main.requests WHERE id IN ({placeholders})",
+                ids
+            )
+            c.execute(
+                f"INSERT OR IGNORE INTO archive.results ({ArchiveModel.RESULT_COLUMNS}) "
+                f"SELECT {ArchiveModel.RESULT_COLUMNS} FROM main.results WHERE request_id IN ({placeholders})",
+                ids
+            )
+            conn.commit()
+
+            c.execute("BEGIN IMMEDIATE")
+            c.execute(
+                "DELETE FROM main.results WHERE id IN ("
+                f"SELECT id FROM archive.results WHERE request_id IN ({placeholders}))",
+                ids
+            )
+            c.execute(
+                "DELETE FROM main.requests WHERE id IN ("
+                f"SELECT id FROM archive.requests WHERE id IN ({placeholders}))",
+                ids
+            )
+            moved = c.rowcount
+            conn.commit()
+            return moved
+        finally:
+            conn.close()
+
+    @staticmethod
+    def incremental_vacuum(pages):
+        """Return up to `pages` free pages of the live database to the file system"""
+        with Database() as c:
+            c.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+            c.fetchall()
+
+    @staticmethod
+    def get_by_id(account_id, request_id):
+        with Database(path=ARCHIVE_DB_NAME) as c:
+            c.execute(RequestModel.BY_ID_SQL, (request_id, account_id))
+            return c.fetchone()
 
 
 class ContactModel:
     """Contact database operations"""
-    
+
+    # Statements shared with database/query_plans.py, which checks their plans
+    INSERT_SQL = """
+        INSERT INTO contacts (account_id, phone_number, name, name_normalized, name_search, phone_search,
+                              date_added)
+        SELECT ?, ?, ?, ?, ?, ?, ?
+        WHERE (SELECT COUNT(*) FROM contacts WHERE account_id=?) < ?
+    """
+    VERSION_SQL = "SELECT version FROM contact_versions WHERE account_id=?"
+    BY_ACCOUNT_SQL = (
+        "SELECT id, phone_number, name, date_added FROM contacts WHERE account_id=? ORDER BY date_added DESC"
+    )
+    BY_ID_SQL = "SELECT id, phone_number, name, date_added FROM contacts WHERE id=? AND account_id=?"
+    BY_PHONE_SQL = (
+        "SELECT id, phone_number, name, name_normalized FROM contacts WHERE account_id=? AND phone_search=? LIMIT ?"
+    )
+    BY_NAME_SQL = (
+        "SELECT id, phone_number, name, name_normalized FROM contacts WHERE account_id=? AND name_search=? LIMIT ?"
+    )
+    # A range on the index; U+10FFFF sorts after every other UTF-8 sequence
+    BY_PREFIX_SQL = (
+        "SELECT id, phone_number, name, name_normalized, name_search FROM contacts "
+        "WHERE account_id=? AND name_search>? AND name_search<? ORDER BY name_search LIMIT ?"
+    )
+    SEARCH_KEYS_SQL = "SELECT id, name_search FROM contacts WHERE account_id=? ORDER BY name_search"
+    DELETE_SQL = "DELETE FROM contacts WHERE id=? AND account_id=?"
+
     @staticmethod
-    def add(account_id, phone_number, name):
-        with Database() as c:
-            date_added = datetime.now(timezone.utc).isoformat()
+    def add(account_id, phone_number, name, limit):
+        """
+        Insert a contact unless the account already has `limit` contacts
+
+        The count and the insert are one statement under the write lock, and
+        the unique (account_id, name_normalized) index rejects duplicate
+        names, so concurrent adds cannot overshoot either rule.
+
+        Returns:
+            int: new contact id, or None if the account is full
+
+        Raises:
+            sqlite3.IntegrityError: if the account already has a contact with this name
+        """
+        with Database(immediate=True) as c:
+            date_added = now_ms()
             c.execute(
-                "INSERT INTO contacts (account_id, phone_number, name, date_added) VALUES (?, ?, ?, ?)",
-                (account_id, phone_number, name, date_added)
+                ContactModel.INSERT_SQL,
+                (account_id, phone_number, name, normalize_name(name), search_key(name), phone_key(phone_number),
+                 date_added, account_id, limit)
             )
-            return c.lastrowid
+            if not c.rowcount:
+                return None
+            contact_id = c.lastrowid
+            ContactModel._bump_version(c, account_id)
+            record_change(c, CHANGE_CONTACTS, account_id)
+            return contact_id
+
+    @staticmethod
+    def _bump_version(cursor, account_id):
+        """Advance the account's contacts version inside the caller's transaction"""
+        cursor.execute(
+            "INSERT INTO contact_versions (account_id, version) VALUES (?, 1) "
+            "ON CONFLICT (account_id) DO UPDATE SET version=version + 1",
+            (account_id,)
+        )
+
+    @staticmethod
+    def get_version(account_id):
+        """Get the account's contacts version; it changes whenever a contact is added or deleted"""
+        with Database() as c:
+            c.execute(ContactModel.VERSION_SQL, (account_id,))
+            row = c.fetchone()
+            return row[0] if row else 0
 
     @staticmethod
     def get_by_account(account_id):
+        with Database() as c:
+            c.execute(ContactModel.BY_ACCOUNT_SQL, (account_id,))
+            return c.fetchall()
+
+    @staticmethod
+    def get_json_by_account(account_id):
+        """Get the account's contacts as JSON objects, newest first"""
         with Database() as c:
             c.execute(
-                "SELECT id, phone_number, name, date_added FROM contacts WHERE account_id=? ORDER BY date_added DESC",
+                f"SELECT {CONTACT_JSON} FROM contacts WHERE account_id=? ORDER BY date_added DESC",
                 (account_id,)
             )
-            return c.fetchall()
+            return [row[0] for row in c.fetchall()]
 
     @staticmethod
     def get_by_id(account_id, contact_id):
+        with Database() as c:
+            c.execute(ContactModel.BY_ID_SQL, (contact_id, account_id))
+            return c.fetchone()
+
+    @staticmethod
+    def find_by_phone(account_id, phone, limit):
+        """Get (id, phone_number, name, name_normalized) of contacts whose phone digits equal `phone`"""
+        with Database() as c:
+            c.execute(ContactModel.BY_PHONE_SQL, (account_id, phone, limit))
+            return c.fetchall()
+
+    @staticmethod
+    def find_by_name(account_id, key, limit):
+        """Get (id, phone_number, name, name_normalized) of contacts whose search key equals `key`"""
+        with Database() as c:
+            c.execute(ContactModel.BY_NAME_SQL, (account_id, key, limit))
+            return c.fetchall()
+
+    @staticmethod
+    def find_by_prefix(account_id, prefix, limit):
+        """Get (id, phone_number, name, name_normalized, name_search) of contacts whose search key starts with `prefix`"""
+        with Database() as c:
+            c.execute(ContactModel.BY_PREFIX_SQL, (account_id, prefix, prefix + '\U0010ffff', limit))
+            return c.fetchall()
+
+    @staticmethod
+    def get_search_keys(account_id):
+        """Get (id, name_search) of every contact of the account"""
+        with Database() as c:
+            c.execute(ContactModel.SEARCH_KEYS_SQL, (account_id,))
+            return c.fetchall()
+
+    @staticmethod
+    def get_many(account_id, contact_ids):
+        """Get (id, phone_number, name, name_normalized) of the given contacts"""
+        if not contact_ids:
+            return []
         with Database() as c:
             c.execute(
-                "SELECT id, phone_number, name, date_added FROM contacts WHERE id=? AND account_id=?",
-                (contact_id, account_id)
+                "SELECT id, phone_number, name, name_normalized FROM contacts "
+                f"WHERE account_id=? AND id IN ({', '.join('?' * len(contact_ids))})",
+                (account_id, *contact_ids)
             )
-            return c.fetchone()
+            return c.fetchall()
 
     @staticmethod
     def delete(account_id, contact_id):
         with Database() as c:
-            c.execute("DELETE FROM contacts WHERE id=? AND account_id=?", (contact_id, account_id))
+            c.execute(ContactModel.DELETE_SQL, (contact_id, account_id))
+            if c.rowcount:
+                ContactModel._bump_version(c, account_id)
+                record_change(c, CHANGE_CONTACTS, account_id)
@@ -0,0 +1,120 @@
+"""
+SQLite connection pool
+
+Each worker process keeps a bounded set of open connections that are
+handed out to request threads and returned after commit/rollback, so a
+query no longer pays for connect(), PRAGMA setup and a cold page cache.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from config import (
+    DB_NAME,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_JOURNAL_MODE,
+    DB_SYNCHRONOUS,
+    DB_CACHE_SIZE_KB,
+    DB_MMAP_SIZE,
+    DB_BUSY_TIMEOUT_MS,
+)
+
+
+class PoolTimeoutError(sqlite3.OperationalError):
+    """Raised when no pooled connection becomes free in time"""
+
+
+def connect(path=DB_NAME):
+    """Open a connection with the tuned PRAGMAs applied"""
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+    )
+    # Only takes effect when the file is new (before journal_mode writes the
+    # header); an existing database is converted with a one-off VACUUM
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute(f"PRAGMA journal_mode={DB_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class ConnectionPool:
+    """Bounded, fork-aware pool of SQLite connections"""
+
+    def __init__(self, path=DB_NAME, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Connections must never cross a fork (gunicorn preloads the app in
+        # the master), so a new process starts with an empty pool.
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if none is idle"""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeoutError("Timed out waiting for a database connection")
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return connect(self.path)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+        self._slots.release()
+
+    def discard(self, conn):
+        """Drop a broken connection and free its slot"""
+        try:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close_all(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool(path=DB_NAME):
+    """Return the process-wide pool for a database file, creating it on first use"""
+    pool = _pools.get(path)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
@@ -0,0 +1,191 @@
+"""
+Statement-level profiling for Database blocks
+
+When DB_PROFILE is on, every Database block gets a cursor that timestamps
+each statement as it is executed. A statement runs until the next one
+starts or the block commits, so its time includes fetching the rows, and
+the COMMIT is timed as a statement of its own. The timings are aggregated
+per normalized statement (literals replaced by ``?``) into a bounded
+in-process table, and any statement slower than SLOW_QUERY_MS is logged
+with its EXPLAIN QUERY PLAN. The time spent waiting for a pooled
+connection is tracked separately from the time spent executing.
+
+sqlite3's trace callback would also see the BEGIN the sqlite3 module
+issues, but it calls back into Python from inside sqlite3_step, with the
+GIL released, and halved create+claim throughput at 8 threads in
+benchmarks/bench_pool.py; the cursor costs no extra GIL round trip.
+"""
+import functools
+import logging
+import re
+import sqlite3
+import threading
+import time
+from config import DB_PROFILE, SLOW_QUERY_MS, PROFILE_MAX_STATEMENTS
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"[xX]?'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACES = re.compile(r"\s+")
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'WITH')
+
+
+@functools.lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """Replace literals with ``?`` and collapse lists of them, so every call of a statement shares a key"""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('?, ...', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+class BlockTrace:
+    """Statements of one Database block as (sql, parameters, seconds)"""
+
+    __slots__ = ('operation', 'statements', '_current', '_started')
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.statements = []
+        self._current = None
+        self._started = None
+
+    def statement(self, sql, parameters=None):
+        """Mark the start of a statement, ending the previous one"""
+        now = time.perf_counter()
+        if self._current is not None:
+            self.statements.append(self._current + (now - self._started,))
+        self._current = (sql, parameters) if sql is not None else None
+        self._started = now
+
+    def finish(self):
+        """End the statement still running when the block ended"""
+        self.statement(None)
+        return self.statements
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports every statement it runs to its block's trace"""
+
+    trace = None
+
+    def execute(self, sql, parameters=()):
+        self.trace.statement(sql, parameters)
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.trace.statement(sql)
+        return super().executemany(sql, seq_of_parameters)
+
+
+class QueryProfiler:
+    """
+    Per-process statement statistics fed by Database blocks
+
+    Statements are keyed by the model method that ran them and their
+    normalized SQL, so each method's BEGIN and COMMIT are counted apart, and
+    keep calls, total and max seconds. The table holds at most
+    `max_statements` entries; when it fills up, the cheaper half is dropped.
+    """
+
+    def __init__(self, enabled, slow_ms, max_statements):
+        self.enabled = enabled
+        self.slow_seconds = slow_ms / 1000
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._operations = {}
+
+    def cursor(self, conn, operation):
+        """Return (cursor, trace) for a block on `conn`; the trace is None when disabled"""
+        if not self.enabled:
+            return conn.cursor(), None
+        cursor = conn.cursor(ProfiledCursor)
+        cursor.trace = BlockTrace(operation)
+        return cursor, cursor.trace
+
+    def finish(self, conn, trace, wait_seconds, exec_seconds):
+        """Record a finished block; slow statements are explained on `conn`"""
+        statements = [
+            (sql, parameters, normalize_sql(sql), seconds)
+            for sql, parameters, seconds in trace.finish()
+        ]
+        with self._lock:
+            operation = self._operations.setdefault(trace.operation, [0, 0.0, 0.0, 0.0])
+            operation[0] += 1
+            operation[1] += wait_seconds
+            operation[2] += exec_seconds
+            operation[3] = max(operation[3], wait_seconds + exec_seconds)
+            for _, _, normalized, seconds in statements:
+                key = (trace.operation, normalized)
+                entry = self._statements.get(key)
+                if entry is None:
+                    if len(self._statements) >= self.max_statements:
+                        self._evict()
+                    entry = self._statements[key] = [0, 0.0, 0.0]
+                entry[0] += 1
+                entry[1] += seconds
+                entry[2] = max(entry[2], seconds)
+
+        for sql, parameters, normalized, seconds in statements:
+            if seconds >= self.slow_seconds:
+                self._log_slow(conn, trace.operation, sql, parameters, normalized, seconds)
+
+    def top(self, limit):
+        """Return the `limit` statements with the highest total time, most expensive first"""
+        with self._lock:
+            entries = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [
+            {
+                'sql': sql,
+                'operation': operation,
+                'calls': calls,
+                'total_ms': total * 1000,
+                'mean_ms': total / calls * 1000,
+                'max_ms': longest * 1000,
+            }
+            for (operation, sql), (calls, total, longest) in entries
+        ]
+
+    def operations(self):
+        """Return connection wait and execution time per model method, by total time"""
+        with self._lock:
+            entries = sorted(self._operations.items(), key=lambda item: item[1][1] + item[1][2], reverse=True)
+        return [
+            {
+                'operation': operation,
+                'blocks': blocks,
+                'wait_ms': wait * 1000,
+                'exec_ms': executing * 1000,
+                'max_ms': longest * 1000,
+            }
+            for operation, (blocks, wait, executing, longest) in entries
+        ]
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._statements.clear()
+            self._operations.clear()
+
+    def _evict(self):
+        # Caller holds the lock
+        ranked = sorted(self._statements, key=lambda key: self._statements[key][1])
+        for key in ranked[:len(ranked) // 2]:
+            del self._statements[key]
+
+    def _log_slow(self, conn, operation, sql, parameters, normalized, seconds):
+        # Parameters carry user data, so they are never logged
+        plan = ''
+        if parameters is not None and sql.lstrip().upper().startswith(_EXPLAINABLE):
+            try:
+                rows = conn.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+                plan = '; '.join(row[3] for row in rows)
+            except Exception as e:
+                plan = f"unavailable ({e})"
+        logger.warning("Slow query (%.1f ms) in %s: %s | plan: %s", seconds * 1000, operation, normalized, plan or '-')
+
+
+query_profiler = QueryProfiler(DB_PROFILE, SLOW_QUERY_MS, PROFILE_MAX_STATEMENTS)
@@ -0,0 +1,146 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot queries in database/models.py
+
+Every statement the request/contact paths run on each API call is listed
+in HOT_QUERIES together with the access path each of its table lookups is
+meant to take. ``check_query_plans`` asks SQLite how it would execute each
+one and reports any whose lookups do not match, and any that would sort
+rows in a temporary b-tree instead of walking an index in order. A plain
+"uses some index" test is not enough: a status-leading index is still a
+SEARCH, but can visit every pending row of every account.
+
+Usage (from the server directory):
+    python -m database.query_plans
+"""
+import re
+import sys
+from constants import STATUS_PENDING, STATUS_PROCESSING, STATUS_DONE, STATUS_FAILED
+from database.models import Database, init_db, RequestModel, ResultModel, ChangeModel, ArchiveModel, ContactModel
+
+PK = "INTEGER PRIMARY KEY"
+REQUESTS_ACCOUNT_CREATED = "idx_requests_account_created"
+REQUESTS_ACCOUNT_STATUS_CREATED = "idx_requests_account_status_created"
+REQUESTS_ACCOUNT_STATUS_ID = "idx_requests_account_status_id"
+REQUESTS_STATUS_CREATED = "idx_requests_status_created"
+REQUESTS_STATUS_LEASE = "idx_requests_status_lease"
+CONTACTS_DATE_ADDED = "idx_contacts_account_date_added"
+CONTACTS_NAME_SEARCH = "idx_contacts_account_name_search"
+CONTACTS_PHONE_SEARCH = "idx_contacts_account_phone_search"
+
+# (model method, SQL, sample parameters, expected access path of each table
+# lookup in plan order); the SQL is the statement the model itself runs, so
+# a changed query is checked without editing this list
+HOT_QUERIES = [
+    ("RequestModel.add", RequestModel.INSERT_SQL, (1, "0912345678", 4500, 1704067200000), ()),
+    ("RequestModel.claim", RequestModel.CLAIM_SQL,
+     (STATUS_PROCESSING, 1704067500000, STATUS_PENDING, 1, 10, STATUS_PENDING),
+     (PK, REQUESTS_ACCOUNT_STATUS_CREATED)),
+    ("RequestModel.reap_expired_leases (fail)", RequestModel.FAIL_EXPIRED_SQL,
+     (STATUS_FAILED, STATUS_PROCESSING, 1704067200000, 3, 500),
+     (PK, REQUESTS_STATUS_LEASE)),
+    ("RequestModel.reap_expired_leases (requeue)", RequestModel.REQUEUE_EXPIRED_SQL,
+     (STATUS_PENDING, STATUS_PROCESSING, 1704067200000, 500),
+     (PK, REQUESTS_STATUS_LEASE)),
+    ("RequestModel.get_all_pending", RequestModel.ALL_PENDING_SQL, (STATUS_PENDING,),
+     (REQUESTS_STATUS_CREATED,)),
+    ("RequestModel.count_active", RequestModel.COUNT_ACTIVE_SQL, (STATUS_PENDING, STATUS_PROCESSING),
+     (REQUESTS_STATUS_CREATED,)),
+    ("RequestModel.get_pending_after", RequestModel.PENDING_AFTER_SQL, (1, STATUS_PENDING, 0, 100),
+     (REQUESTS_ACCOUNT_STATUS_ID,)),
+    ("RequestModel.get_by_id", RequestModel.BY_ID_SQL, (1, 1), (PK,)),
+    ("RequestModel.get_by_account", RequestModel.BY_ACCOUNT_SQL, (1,), (REQUESTS_ACCOUNT_CREATED,)),
+    ("RequestModel.get_page (first)", *RequestModel.page_query(1, 21), (REQUESTS_ACCOUNT_CREATED,)),
+    ("RequestModel.get_page", *RequestModel.page_query(1, 21, (1704067200000, 10)), (REQUESTS_ACCOUNT_CREATED,)),
+    ("RequestModel.get_page (json)", *RequestModel.page_query(1, 21, (1704067200000, 10), as_json=True),
+     (REQUESTS_ACCOUNT_CREATED,)),
+    ("RequestModel.get_page (status filter)",
+     *RequestModel.page_query(1, 21, (1704067200000, 10), [STATUS_FAILED]),
+     (REQUESTS_ACCOUNT_STATUS_CREATED,)),
+    ("RequestModel.get_page (several statuses)",
+     *RequestModel.page_query(1, 21, (1704067200000, 10), [STATUS_PENDING, STATUS_PROCESSING]),
+     (REQUESTS_ACCOUNT_STATUS_CREATED, REQUESTS_ACCOUNT_STATUS_CREATED)),
+    ("RequestModel.update_status", RequestModel.UPDATE_STATUS_SQL, (STATUS_PROCESSING, 1, 1), (PK,)),
+    ("ResultModel.record_many", ResultModel.REQUEST_STATE_SQL, (1, 1), (PK,)),
+    ("ChangeModel.get_after", ChangeModel.AFTER_SQL, (0, 1000), (PK,)),
+    ("ArchiveModel.archive_finished", ArchiveModel.FINISHED_SQL, (STATUS_DONE, STATUS_FAILED, 1704067200000, 500),
+     (REQUESTS_STATUS_CREATED,)),
+    ("ContactModel.add", ContactModel.INSERT_SQL,
+     (1, "0912345678", "Name", "name", "name", "0912345678", 1704067200000, 1, 5),
+     (CONTACTS_DATE_ADDED,)),
+    ("ContactModel.find_by_phone", ContactModel.BY_PHONE_SQL, (1, "0912345678", 5), (CONTACTS_PHONE_SEARCH,)),
+    ("ContactModel.find_by_name", ContactModel.BY_NAME_SQL, (1, "name", 5), (CONTACTS_NAME_SEARCH,)),
+    ("ContactModel.find_by_prefix", ContactModel.BY_PREFIX_SQL, (1, "na", "na\U0010ffff", 5),
+     (CONTACTS_NAME_SEARCH,)),
+    ("ContactModel.get_search_keys", ContactModel.SEARCH_KEYS_SQL, (1,), (CONTACTS_NAME_SEARCH,)),
+    ("ContactModel.get_version", ContactModel.VERSION_SQL, (1,), (PK,)),
+    ("ContactModel.get_by_account", ContactModel.BY_ACCOUNT_SQL, (1,), (CONTACTS_DATE_ADDED,)),
+    ("ContactModel.get_by_id", ContactModel.BY_ID_SQL, (1, 1), (PK,)),
+    ("ContactModel.delete", ContactModel.DELETE_SQL, (1, 1), (PK,)),
+]
+
+# Sorts a statement may do because their input is bounded by the live
+# backlog rather than by the table
+ALLOWED_SORTS = {
+    "RequestModel.count_active": "USE TEMP B-TREE FOR GROUP BY",
+}
+
+_ACCESS = re.compile(r"USING (?:COVERING )?INDEX (\w+)|USING (INTEGER PRIMARY KEY)")
+
+
+def explain(cursor, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[3] for row in cursor.fetchall()]
+
+
+def access_paths(plan):
+    """Return the index (or INTEGER PRIMARY KEY) of each table lookup in a plan; None for a full scan"""
+    paths = []
+    for detail in plan:
+        if not detail.startswith(("SEARCH ", "SCAN ")) or detail == "SCAN CONSTANT ROW":
+            continue
+        if detail.startswith("SCAN ") and detail.split()[1].startswith("("):
+            continue  # Reading a subquery's rows, not a table
+        match = _ACCESS.search(detail) if detail.startswith("SEARCH ") else None
+        paths.append(match and (match.group(1) or match.group(2)))
+    return tuple(paths)
+
+
+def plan_problems(plan, expected, allowed_sort=None):
+    """Return the plan lines showing a lookup other than `expected`, or a sort other than `allowed_sort`"""
+    problems = [detail for detail in plan if "USE TEMP B-TREE" in detail and detail != allowed_sort]
+    if access_paths(plan) != tuple(expected):
+        problems += [
+            detail for detail in plan
+            if detail.startswith(("SEARCH ", "SCAN ")) and detail != "SCAN CONSTANT ROW"
+        ]
+        problems.append(f"expected {', '.join(expected) or 'no lookup'}")
+    return problems
+
+
+def check_query_plans(cursor, queries=HOT_QUERIES):
+    """Return {method: problem plan lines} for every query that does not take its expected lookups"""
+    problems = {}
+    for name, sql, params, expected in queries:
+        bad = plan_problems(explain(cursor, sql, params), expected, ALLOWED_SORTS.get(name))
+        if bad:
+            problems[name] = bad
+    return problems
+
+
+def main():
+    init_db()
+    with Database() as c:
+        problems = check_query_plans(c)
+        for name, sql, params, _ in HOT_QUERIES:
+            status = "FAIL" if name in problems else "ok"
+            print(f"[{status:4}] {name}: {'; '.join(explain(c, sql, params))}")
+            for problem in problems.get(name, ()):
+                print(f"         {problem}")
+
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,40 @@
 set -e
 
 LAST_HASH=""
+LAST_ARCHIVE_HASH=""
+
+# The live database runs in WAL mode, so recent commits may still sit in
+# db.sqlite3-wal. Upload a consistent snapshot taken with the backup API
+# instead of copying the main file directly.
+snapshot_db() {
+  python -c "import sqlite3; sqlite3.connect('$1').backup(sqlite3.connect('$2'))"
+}
 
 while true; do
   sleep 300  # 5 minutes
 
   if [ -f /app/db.sqlite3 ]; then
-    CURRENT_HASH=$(md5sum /app/db.sqlite3 | awk '{ print $1 }')
+    snapshot_db /app/db.sqlite3 /app/db.snapshot.sqlite3
+    CURRENT_HASH=$(md5sum /app/db.snapshot.sqlite3 | awk '{ print $1 }')
 
     if [ "$CURRENT_HASH" != "$LAST_HASH" ]; then
       echo "Database changed, uploading..."
-      gsutil cp /app/db.sqlite3 gs://$DB_BUCKET/db.sqlite3
+      gsutil cp /app/db.snapshot.sqlite3 gs://$DB_BUCKET/db.sqlite3
       LAST_HASH=$CURRENT_HASH
     else
       echo "No changes detected, skipping upload."
     fi
   fi
-done
\ No newline at end of file
+
+  # Finished requests moved out of db.sqlite3 by retention live here
+  if [ -f /app/archive.sqlite3 ]; then
+    snapshot_db /app/archive.sqlite3 /app/archive.snapshot.sqlite3
+    CURRENT_HASH=$(md5sum /app/archive.snapshot.sqlite3 | awk '{ print $1 }')
+
+    if [ "$CURRENT_HASH" != "$LAST_ARCHIVE_HASH" ]; then
+      echo "Archive changed, uploading..."
+      gsutil cp /app/archive.snapshot.sqlite3 gs://$DB_BUCKET/archive.sqlite3
+      LAST_ARCHIVE_HASH=$CURRENT_HASH
+    fi
+  fi
+done
@@ -2,13 +2,18 @@
 set -e
 
 gsutil cp gs://$DB_BUCKET/db.sqlite3 /app/db.sqlite3 || echo "No DB found, creating new one"
+gsutil cp gs://$DB_BUCKET/archive.sqlite3 /app/archive.sqlite3 || echo "No archive found, creating new one"
 
 /app/db_sync.sh &
 
-gunicorn main:app --bind 0.0.0.0:$PORT &
+# Per-worker metrics files from a previous run would be merged into this one
+export METRICS_DIR=${METRICS_DIR:-/tmp/easytransfer-metrics}
+rm -rf "$METRICS_DIR"
+
+gunicorn main:app --bind 0.0.0.0:$PORT --threads ${GUNICORN_THREADS:-16} &
 
 PID=$!
 
-trap "echo 'Uploading DB before exit...'; gsutil cp /app/db.sqlite3 gs://$DB_BUCKET/db.sqlite3; exit 0" TERM INT
+trap "echo 'Uploading DB before exit...'; python -c \"import sqlite3; sqlite3.connect('/app/db.sqlite3').backup(sqlite3.connect('/app/db.snapshot.sqlite3'))\"; gsutil cp /app/db.snapshot.sqlite3 gs://$DB_BUCKET/db.sqlite3; python -c \"import sqlite3; sqlite3.connect('/app/archive.sqlite3').backup(sqlite3.connect('/app/archive.snapshot.sqlite3'))\"; gsutil cp /app/archive.snapshot.sqlite3 gs://$DB_BUCKET/archive.sqlite3; exit 0" TERM INT
 
 wait $PID
\ No newline at end of file
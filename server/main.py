@@ -3,6 +3,18 @@ from database.models import init_db
 from routes.request_routes import request_bp
 from routes.contact_routes import contact_bp
 from routes.health_routes import health_bp
+from routes.admin_routes import admin_bp
+from services.request_service import RequestService
+from services.contact_service import ContactService
+from services.retention_service import RetentionService
+from utils.background import start_periodic
+from utils.coherence import change_listener
+from utils.compression import init_compression
+from utils.json_provider import get_json_provider
+from utils.metrics import metrics, init_request_metrics
+from utils.auth import token_cache_metrics
+from config import REAPER_INTERVAL_SECONDS, RETENTION_INTERVAL_SECONDS, JSON_PROVIDER
+from constants import CHANGE_PENDING, CHANGE_CONTACTS
 from dotenv import load_dotenv
 import os
 
@@ -12,6 +24,7 @@ load_dotenv()
 def create_app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('JWT_SECRET', 'fallback-secret-key')
+    app.json = get_json_provider(JSON_PROVIDER)(app)
 
     # Security headers
     @app.after_request
@@ -23,19 +36,40 @@ def create_app():
         response.headers['Content-Security-Policy'] = "default-src 'self'"
         return response
 
+    # Compress large bodies for clients that accept it
+    init_compression(app)
+
+    # Request/query metrics, merged across worker processes on GET /metrics
+    init_request_metrics(app)
+    metrics.add_collector(token_cache_metrics)
+    metrics.start()
+
     # Initialize DB
     init_db()
 
+    # Follow writes made by the other worker processes, starting before any
+    # in-process state is loaded so nothing written meanwhile is missed
+    change_listener.subscribe(CHANGE_PENDING, RequestService.on_pending_changed)
+    change_listener.subscribe(CHANGE_CONTACTS, ContactService.on_contacts_changed)
+    change_listener.start()
+    RequestService.rebuild_pending_index()
+
+    # Requeue requests whose device crashed before reporting a result
+    start_periodic('lease-reaper', REAPER_INTERVAL_SECONDS, RequestService.reap_expired_leases)
+
+    # Move old finished requests into the archive database
+    start_periodic('retention', RETENTION_INTERVAL_SECONDS, RetentionService.run)
+
     # Register blueprints
     app.register_blueprint(request_bp)
     app.register_blueprint(contact_bp)
     app.register_blueprint(health_bp)
+    app.register_blueprint(admin_bp)
 
     return app
 
 # Make app visible for Gunicorn
 app = create_app()
-app.json.ensure_ascii = False
 
 if __name__ == '__main__':
     debug_mode = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
@@ -0,0 +1,38 @@
+import os
+from flask import Blueprint, request, jsonify
+from database.profiler import query_profiler
+from utils.auth import require_admin
+from config import PROFILE_TOP_N, SLOW_QUERY_MS
+from constants import ERROR_INVALID_LIMIT
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.route('/queries', methods=['GET'])
+@require_admin
+def get_query_profile(account_id):
+    """
+    The most expensive statements and model methods of the worker that answers
+
+    Query parameters: limit (default PROFILE_TOP_N). Statistics are kept
+    per process, so `pid` tells which gunicorn worker they come from.
+    """
+    limit = request.args.get('limit', PROFILE_TOP_N, type=int)
+    if limit < 1:
+        return jsonify({'error': ERROR_INVALID_LIMIT}), 400
+
+    return jsonify({
+        'pid': os.getpid(),
+        'profiling': query_profiler.enabled,
+        'slow_query_ms': SLOW_QUERY_MS,
+        'statements': query_profiler.top(limit),
+        'operations': query_profiler.operations()
+    })
+
+
+@admin_bp.route('/queries', methods=['DELETE'])
+@require_admin
+def reset_query_profile(account_id):
+    """Clear the answering worker's statement statistics"""
+    query_profiler.reset()
+    return jsonify({'pid': os.getpid()})
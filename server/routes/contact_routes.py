@@ -1,57 +1,88 @@
 from flask import Blueprint, request, jsonify
 from services.contact_service import ContactService
 from utils.auth import require_auth
-from utils.validation import validate_phone_number, validate_name, validate_contact_id
+from utils.validation import validate_phone_number, validate_name
+from utils.schema import Schema, Field, body
+from utils.http_cache import not_modified, with_etag
+from utils.json_provider import fragment_array, jsonify_fragments
+from config import RESOLVE_LIMIT, RESOLVE_LIMIT_MAX
 from constants import (
     ERROR_MISSING_REQUIRED_FIELDS_CONTACT,
+    ERROR_RESOLVE_QUERY_REQUIRED,
+    ERROR_NAME_TOO_LONG,
+    ERROR_INVALID_LIMIT,
+    MAX_NAME_LENGTH,
     SUCCESS_CONTACT_ADDED,
     SUCCESS_CONTACT_DELETED,
 )
 
 contact_bp = Blueprint('contacts', __name__, url_prefix='/contacts')
 
+CONTACT_SCHEMA = Schema(
+    Field('phone_number', validate_phone_number, required=True),
+    Field('name', validate_name, required=True),
+    missing=ERROR_MISSING_REQUIRED_FIELDS_CONTACT,
+)
+
 
 @contact_bp.route('/', methods=['GET'])
 @require_auth
 def get_contacts(account_id):
-    """Get all contacts for an account"""
-    rows = ContactService.get_contacts(account_id)
-    contacts = []
-    for row in rows:
-        contacts.append({
-            'id': row[0],
-            'phone_number': row[1],
-            'name': row[2],
-            'date_added': row[3]
-        })
-    return jsonify({'contacts': contacts}), 200
+    """Get all contacts for an account; revalidate with If-None-Match"""
+    # The version is read before the rows, so a concurrent change can only
+    # label newer rows with an older ETag, never the other way around
+    etag = f"contacts-{account_id}-{ContactService.get_contacts_version(account_id)}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
 
+    contacts = fragment_array(ContactService.get_contacts_json(account_id))
+    return with_etag(jsonify_fragments(contacts=contacts), etag), 200
 
-@contact_bp.route('/', methods=['POST'])
+
+@contact_bp.route('/resolve', methods=['GET'])
 @require_auth
-def add_contact(account_id):
-    """Add a new contact"""
-    data = request.get_json()
-    
-    if not data:
-        return jsonify({'error': 'Request body is required'}), 400
-    
-    phone_number = data.get('phone_number')
-    name = data.get('name')
+def resolve_contact(account_id):
+    """
+    Resolve a typed name or phone number to ranked contact candidates
 
-    if not phone_number or not name:
-        return jsonify({'error': ERROR_MISSING_REQUIRED_FIELDS_CONTACT}), 400
+    Query parameters: q (required), limit (default RESOLVE_LIMIT).
+    Each candidate's `match` is one of phone, exact, normalized, prefix or
+    fuzzy, best first; `distance` is the edit distance for fuzzy matches
+    and the number of extra characters for prefix matches.
+    """
+    query = (request.args.get('q') or '').strip()
+    if not query:
+        return jsonify({'error': ERROR_RESOLVE_QUERY_REQUIRED}), 400
+    if len(query) > MAX_NAME_LENGTH:
+        return jsonify({'error': ERROR_NAME_TOO_LONG}), 400
 
-    # Validate phone number
-    is_valid_phone, phone_error = validate_phone_number(phone_number)
-    if not is_valid_phone:
-        return jsonify({'error': phone_error}), 400
+    limit = request.args.get('limit', RESOLVE_LIMIT, type=int)
+    if limit < 1:
+        return jsonify({'error': ERROR_INVALID_LIMIT}), 400
+    limit = min(limit, RESOLVE_LIMIT_MAX)
 
-    # Validate name
-    is_valid_name, name_error = validate_name(name)
-    if not is_valid_name:
-        return jsonify({'error': name_error}), 400
+    candidates = ContactService.resolve_contacts(account_id, query, limit)
+    return jsonify({
+        'query': query,
+        'candidates': [
+            {
+                'id': contact_id,
+                'phone_number': phone_number,
+                'name': name,
+                'match': match,
+                'distance': distance
+            }
+            for contact_id, phone_number, name, match, distance in candidates
+        ]
+    }), 200
 
+
+@contact_bp.route('/', methods=['POST'])
+@require_auth
+@body(CONTACT_SCHEMA)
+def add_contact(account_id, phone_number, name):
+    """Add a new contact"""
     try:
         contact_id = ContactService.add_contact(account_id, phone_number, name)
         return jsonify({'contact_id': contact_id, 'message': SUCCESS_CONTACT_ADDED}), 201
@@ -1,6 +1,10 @@
-from flask import Blueprint, jsonify
+import hmac
+from flask import Blueprint, current_app, jsonify, request
+from services.request_service import RequestService
 from utils.auth import require_auth
-from constants import STATUS_PONG
+from utils.metrics import metrics
+from config import METRICS_TOKEN, METRICS_PUBLIC
+from constants import STATUS_PONG, ERROR_INVALID_TOKEN, ERROR_METRICS_DISABLED
 
 health_bp = Blueprint('health', __name__)
 
@@ -17,3 +21,24 @@ def ping_auth(account_id):
         'status': STATUS_PONG,
         'authenticated': True,
     })
+
+@health_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    Prometheus metrics of all worker processes, in the text exposition format
+
+    The scraper must send METRICS_TOKEN as a bearer token. Without a token
+    the endpoint is refused, because the queue-depth gauge is labelled by
+    account, unless METRICS_PUBLIC opens it.
+    """
+    if METRICS_TOKEN:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {METRICS_TOKEN}"):
+            return jsonify({'error': ERROR_INVALID_TOKEN}), 401
+    elif not METRICS_PUBLIC:
+        return jsonify({'error': ERROR_METRICS_DISABLED}), 403
+
+    gauges = {
+        ('easytransfer_queue_depth', (('account_id', str(account_id)), ('status', status))): count
+        for account_id, status, count in RequestService.get_queue_depths()
+    }
+    return current_app.response_class(metrics.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
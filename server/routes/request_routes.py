@@ -1,62 +1,181 @@
-from flask import Blueprint, request, jsonify
+from decimal import Decimal
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from services.request_service import RequestService
 from utils.auth import require_auth
-from utils.validation import validate_phone_number, validate_amount, validate_request_id
+from utils.validation import validate_phone_number, validate_amount, validate_request_id, validate_lease_token
+from utils.schema import Schema, Field, ValidationError, body, one_of
+from utils.units import from_minor_units, iso_from_ms
+from utils.http_cache import not_modified, with_etag
+from utils.json_provider import fragment_array, jsonify_fragments
+from config import (
+    SSE_RETRY_MS,
+    REQUEST_BATCH_MAX,
+    RESULT_BATCH_MAX,
+    HISTORY_PAGE_SIZE,
+    HISTORY_PAGE_MAX,
+)
 from constants import (
+    ERROR_BODY_REQUIRED,
     ERROR_MISSING_REQUIRED_FIELDS_REQUEST,
     ERROR_INVALID_STATUS,
     ERROR_REQUEST_NOT_FOUND,
+    ERROR_INVALID_LIMIT,
+    ERROR_INVALID_STATUS_FILTER,
+    ERROR_BATCH_REQUIRED,
+    ERROR_BATCH_TOO_LARGE,
+    ERROR_RESULTS_BATCH_REQUIRED,
+    ERROR_RESULTS_BATCH_TOO_LARGE,
+    ERROR_STALE_LEASE,
     STATUS_OK,
     STATUS_PENDING,
     STATUS_EMPTY,
     STATUS_SUCCESS,
     STATUS_FAILED,
     MESSAGE_NO_PENDING_REQUESTS,
+    REQUEST_STATUSES,
+    RESULT_RECORDED,
+    RESULT_DUPLICATE,
+    RESULT_NOT_FOUND,
+    RESULT_STALE,
 )
 
 request_bp = Blueprint('requests', __name__, url_prefix='/requests')
 
+TRANSFER_SCHEMA = Schema(
+    Field('phone_number', validate_phone_number, required=True),
+    Field('amount', validate_amount, coerce=lambda amount: Decimal(str(amount)), required=True),
+    missing=ERROR_MISSING_REQUIRED_FIELDS_REQUEST,
+)
+
+# The lease token is optional for older devices
+RESULT_SCHEMA = Schema(
+    Field('status', one_of((STATUS_SUCCESS, STATUS_FAILED), ERROR_INVALID_STATUS)),
+    Field('message', default=''),
+    Field('lease_token', validate_lease_token, coerce=int),
+)
+
+RESULT_ITEM_SCHEMA = Schema(
+    Field('request_id', validate_request_id, coerce=int),
+    *RESULT_SCHEMA.fields,
+)
+
 
 @request_bp.route('/', methods=['POST'])
 @require_auth
-def create_request(account_id):
+@body(TRANSFER_SCHEMA)
+def create_request(account_id, phone_number, amount):
     """Create a new request"""
+    request_id = RequestService.create_request(account_id, phone_number, amount)
+    return jsonify({'request_id': request_id, 'status': STATUS_PENDING}), 201
+
+
+@request_bp.route('/', methods=['GET'])
+@require_auth
+def get_request_history(account_id):
+    """Get the account's requests, newest first, one keyset page at a time"""
+    limit = request.args.get('limit', HISTORY_PAGE_SIZE, type=int)
+    if limit < 1:
+        return jsonify({'error': ERROR_INVALID_LIMIT}), 400
+    limit = min(limit, HISTORY_PAGE_MAX)
+
+    statuses = None
+    if request.args.get('status'):
+        statuses = request.args['status'].split(',')
+        if any(status not in REQUEST_STATUSES for status in statuses):
+            return jsonify({'error': ERROR_INVALID_STATUS_FILTER}), 400
+
+    try:
+        rows, next_cursor = RequestService.get_history(
+            account_id, limit, request.args.get('cursor'), statuses, as_json=True
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify_fragments(requests=fragment_array(rows), next_cursor=next_cursor)
+
+
+@request_bp.route('/batch', methods=['POST'])
+@require_auth
+def create_requests_batch(account_id):
+    """Create many requests in one transaction, reporting a result per item"""
     data = request.get_json()
-    
+
     if not data:
-        return jsonify({'error': 'Request body is required'}), 400
-    
-    phone_number = data.get('phone_number')
-    amount = data.get('amount')
+        return jsonify({'error': ERROR_BODY_REQUIRED}), 400
 
-    if not phone_number or not amount:
-        return jsonify({'error': ERROR_MISSING_REQUIRED_FIELDS_REQUEST}), 400
+    items = data.get('requests') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': ERROR_BATCH_REQUIRED}), 400
 
-    # Validate phone number
-    is_valid_phone, phone_error = validate_phone_number(phone_number)
-    if not is_valid_phone:
-        return jsonify({'error': phone_error}), 400
+    if len(items) > REQUEST_BATCH_MAX:
+        return jsonify({'error': ERROR_BATCH_TOO_LARGE.format(limit=REQUEST_BATCH_MAX)}), 400
 
-    # Validate amount
-    is_valid_amount, amount_error = validate_amount(amount)
-    if not is_valid_amount:
-        return jsonify({'error': amount_error}), 400
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            values = TRANSFER_SCHEMA.parse(item)
+        except ValidationError as e:
+            results[index] = {'index': index, 'error': str(e)}
+        else:
+            valid.append((index, values['phone_number'], values['amount']))
 
-    request_id = RequestService.create_request(account_id, phone_number, amount)
-    return jsonify({'request_id': request_id, 'status': STATUS_PENDING}), 201
+    request_ids = RequestService.create_requests(
+        account_id, [(phone_number, amount) for _, phone_number, amount in valid]
+    )
+    for (index, _, _), request_id in zip(valid, request_ids):
+        results[index] = {'index': index, 'request_id': request_id, 'status': STATUS_PENDING}
+
+    return jsonify({
+        'results': results,
+        'created': len(request_ids),
+        'failed': len(items) - len(request_ids)
+    }), 201 if request_ids else 400
 
 
 @request_bp.route('/next', methods=['GET'])
 @require_auth
 def get_next_request(account_id):
-    """Get the next pending request"""
-    row = RequestService.get_next_pending(account_id)
+    """
+    Get the next pending request, optionally waiting up to ?wait=N seconds for one
+
+    With ?limit=N up to N requests are claimed at once and returned as a list.
+    """
+    wait = request.args.get('wait', 0, type=int)
+
+    if 'limit' in request.args:
+        limit = request.args.get('limit', type=int)
+        if not limit or limit < 1:
+            return jsonify({'error': ERROR_INVALID_LIMIT}), 400
+
+        rows = RequestService.claim_pending(account_id, limit, wait=wait)
+        if not rows:
+            return jsonify({
+                'requests': [],
+                'message': MESSAGE_NO_PENDING_REQUESTS,
+                'status': STATUS_EMPTY
+            }), 200
+        return jsonify({
+            'requests': [
+                {
+                    'request_id': request_id,
+                    'phone_number': phone_number,
+                    'amount': from_minor_units(amount),
+                    'lease_token': lease_token
+                }
+                for request_id, phone_number, amount, lease_token in rows
+            ],
+            'status': STATUS_OK
+        })
+
+    row = RequestService.get_next_pending(account_id, wait=wait)
     if row:
-        request_id, phone_number, amount = row
+        request_id, phone_number, amount, lease_token = row
         return jsonify({
             'request_id': request_id,
             'phone_number': phone_number,
-            'amount': amount,
+            'amount': from_minor_units(amount),
+            'lease_token': lease_token,
             'status': STATUS_OK
         })
     else:
@@ -66,36 +185,125 @@ def get_next_request(account_id):
         }), 200
 
 
+@request_bp.route('/stream', methods=['GET'])
+@require_auth
+def stream_requests(account_id):
+    """Stream pending requests as Server-Sent Events"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '0')
+    try:
+        last_id = max(int(last_event_id), 0)
+    except ValueError:
+        last_id = 0
+
+    def generate():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        for row in RequestService.watch_pending(account_id, last_id):
+            if row is None:
+                yield ": keepalive\n\n"
+                continue
+            request_id, phone_number, amount, created_at = row
+            data = current_app.json.dumps({
+                'request_id': request_id,
+                'phone_number': phone_number,
+                'amount': from_minor_units(amount),
+                'created_at': iso_from_ms(created_at),
+                'status': STATUS_PENDING
+            })
+            yield f"id: {request_id}\nevent: request\ndata: {data}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @request_bp.route('/<int:request_id>/result', methods=['POST'])
 @require_auth
-def add_result(account_id, request_id):
+@body(RESULT_SCHEMA)
+def add_result(account_id, request_id, status, message, lease_token):
     """Add result for a request"""
+    outcome, _ = RequestService.add_result(account_id, request_id, status, message, lease_token)
+    if outcome == RESULT_NOT_FOUND:
+        return jsonify({'error': ERROR_REQUEST_NOT_FOUND}), 404
+    if outcome == RESULT_STALE:
+        return jsonify({'error': ERROR_STALE_LEASE}), 409
+    return jsonify({'request_id': request_id, 'final_status': status, 'message': message})
+
+
+@request_bp.route('/results/batch', methods=['POST'])
+@require_auth
+def add_results_batch(account_id):
+    """Add results for many requests in one transaction; replays are ignored"""
     data = request.get_json()
-    
+
     if not data:
-        return jsonify({'error': 'Request body is required'}), 400
-    
-    status = data.get('status')
-    message = data.get('message', '')
+        return jsonify({'error': ERROR_BODY_REQUIRED}), 400
 
-    if status not in [STATUS_SUCCESS, STATUS_FAILED]:
-        return jsonify({'error': ERROR_INVALID_STATUS}), 400
+    items = data.get('results') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': ERROR_RESULTS_BATCH_REQUIRED}), 400
 
-    RequestService.add_result(account_id, request_id, status, message)
-    return jsonify({'request_id': request_id, 'final_status': status, 'message': message})
+    if len(items) > RESULT_BATCH_MAX:
+        return jsonify({'error': ERROR_RESULTS_BATCH_TOO_LARGE.format(limit=RESULT_BATCH_MAX)}), 400
+
+    responses = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        try:
+            values = RESULT_ITEM_SCHEMA.parse(item)
+        except ValidationError as e:
+            if e.field in (None, 'request_id'):
+                responses[index] = {'index': index, 'error': str(e)}
+            else:
+                # Echoed as sent, like every other error for a valid id
+                responses[index] = {'index': index, 'request_id': item['request_id'], 'error': str(e)}
+            continue
+        valid.append((index, values['request_id'], values['status'], values['message'], values['lease_token']))
+
+    outcomes = RequestService.add_results(
+        account_id, [item[1:] for item in valid]
+    ) if valid else []
+    counts = {RESULT_RECORDED: 0, RESULT_DUPLICATE: 0, RESULT_NOT_FOUND: 0, RESULT_STALE: 0}
+    for (index, request_id, *_), (outcome, request_status) in zip(valid, outcomes):
+        counts[outcome] += 1
+        if outcome == RESULT_NOT_FOUND:
+            responses[index] = {'index': index, 'request_id': request_id, 'error': ERROR_REQUEST_NOT_FOUND}
+        elif outcome == RESULT_STALE:
+            responses[index] = {'index': index, 'request_id': request_id, 'error': ERROR_STALE_LEASE}
+        else:
+            responses[index] = {
+                'index': index,
+                'request_id': request_id,
+                'request_status': request_status,
+                'result': outcome
+            }
+
+    return jsonify({
+        'results': responses,
+        'recorded': counts[RESULT_RECORDED],
+        'duplicates': counts[RESULT_DUPLICATE],
+        'failed': len(items) - len(valid) + counts[RESULT_NOT_FOUND] + counts[RESULT_STALE]
+    })
 
 
 @request_bp.route('/status/<int:request_id>', methods=['GET'])
 @require_auth
 def get_request_status(account_id, request_id):
-    """Get request status by ID"""
+    """Get request status by ID; revalidate with If-None-Match"""
     row = RequestService.get_request_by_id(account_id, request_id)
     if row:
-        return jsonify({
+        # attempts only grows and each claim moves the status, so the pair
+        # versions the request without a dedicated column
+        etag = f"request-{row[0]}-{row[4]}-{row[3]}"
+        cached = not_modified(etag)
+        if cached:
+            return cached
+        return with_etag(jsonify({
             'request_id': row[0],
             'phone_number': row[1],
-            'amount': row[2],
+            'amount': from_minor_units(row[2]),
             'status': row[3]
-        })
+        }), etag)
     else:
         return jsonify({'error': ERROR_REQUEST_NOT_FOUND}), 404
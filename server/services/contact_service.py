@@ -1,5 +1,12 @@
+import sqlite3
 from database.models import ContactModel
-from config import MAX_CONTACTS_PER_ACCOUNT
+from utils.account_cache import AccountCache
+from utils.names import normalize_name, search_key, phone_key, fuzzy_key, within_distance
+from config import (
+    MAX_CONTACTS_PER_ACCOUNT,
+    RESOLVE_FUZZY_MAX_DISTANCE,
+    RESOLVE_CACHE_ACCOUNTS,
+)
 from constants import (
     ERROR_CONTACT_LIMIT_REACHED,
     ERROR_DUPLICATE_CONTACT_NAME,
@@ -8,9 +15,29 @@ from constants import (
     ERROR_NAME_IS_DIGIT,
     ERROR_CONTACT_NOT_FOUND,
     MAX_PHONE_NUMBER_LENGTH,
-    MAX_NAME_LENGTH
+    MAX_NAME_LENGTH,
+    MATCH_PHONE,
+    MATCH_EXACT,
+    MATCH_NORMALIZED,
+    MATCH_PREFIX,
+    MATCH_FUZZY,
 )
 
+# Candidates are ranked by match kind first, then by distance
+_MATCH_RANK = {MATCH_PHONE: 0, MATCH_EXACT: 1, MATCH_NORMALIZED: 2, MATCH_PREFIX: 3, MATCH_FUZZY: 4}
+
+# Fuzzy keys of every contact's name_search and of its words, per account
+_search_keys = AccountCache(RESOLVE_CACHE_ACCOUNTS)
+
+
+def _load_search_keys(account_id):
+    return [
+        (contact_id, fuzzy_key(name_key),
+         tuple(fuzzy_key(word) for word in name_key.split(' ')) if ' ' in name_key else ())
+        for contact_id, name_key in ContactModel.get_search_keys(account_id)
+        if name_key
+    ]
+
 
 class ContactService:
     """Business logic for contacts"""
@@ -20,20 +47,19 @@ class ContactService:
         """Get all contacts for an account"""
         return ContactModel.get_by_account(account_id)
     
+    @staticmethod
+    def get_contacts_json(account_id):
+        """Get all contacts for an account as JSON object strings"""
+        return ContactModel.get_json_by_account(account_id)
+    
+    @staticmethod
+    def get_contacts_version(account_id):
+        """Get the version that changes whenever the account's contact list does"""
+        return ContactModel.get_version(account_id)
+    
     @staticmethod
     def add_contact(account_id, phone_number, name):
         """Add a new contact with validation"""
-        # Check contact limit
-        existing_contacts = ContactModel.get_by_account(account_id)
-        if len(existing_contacts) >= MAX_CONTACTS_PER_ACCOUNT:
-            raise ValueError(ERROR_CONTACT_LIMIT_REACHED.format(limit=MAX_CONTACTS_PER_ACCOUNT))
-        
-        # Check for duplicate name
-        for contact in existing_contacts:
-            contact_id, phone_number, existing_name, date_added = contact
-            if existing_name.lower() == name.lower():
-                raise ValueError(ERROR_DUPLICATE_CONTACT_NAME.format(name=name))
-        
         # Validate phone number length
         if len(phone_number) > MAX_PHONE_NUMBER_LENGTH:
             raise ValueError(ERROR_PHONE_NUMBER_TOO_LONG)
@@ -44,7 +70,17 @@ class ContactService:
         if len(name) > MAX_NAME_LENGTH:
             raise ValueError(ERROR_NAME_TOO_LONG)
         
-        return ContactModel.add(account_id, phone_number, name)
+        # The contact limit and duplicate names are enforced by the database
+        try:
+            contact_id = ContactModel.add(account_id, phone_number, name, MAX_CONTACTS_PER_ACCOUNT)
+        except sqlite3.IntegrityError as e:
+            if e.sqlite_errorname == 'SQLITE_CONSTRAINT_UNIQUE':
+                raise ValueError(ERROR_DUPLICATE_CONTACT_NAME.format(name=name))
+            raise
+        if contact_id is None:
+            raise ValueError(ERROR_CONTACT_LIMIT_REACHED.format(limit=MAX_CONTACTS_PER_ACCOUNT))
+        _search_keys.invalidate(account_id)
+        return contact_id
     
     @staticmethod
     def delete_contact(account_id, contact_id):
@@ -55,3 +91,67 @@ class ContactService:
             raise ValueError(ERROR_CONTACT_NOT_FOUND)
         
         ContactModel.delete(account_id, contact_id)
+        _search_keys.invalidate(account_id)
+
+    @staticmethod
+    def on_contacts_changed(account_id):
+        """Change-log handler: another worker added or deleted contacts of the account"""
+        _search_keys.invalidate(account_id)
+
+    @staticmethod
+    def resolve_contacts(account_id, query, limit):
+        """
+        Find the contacts a typed name or phone number most likely refers to
+
+        Lookups go from cheapest to loosest and stop once `limit` candidates
+        are found: phone digits and the normalized name are single index
+        probes, a prefix is an index range, and only then are the account's
+        cached search keys compared by bounded edit distance.
+
+        Returns:
+            list: (id, phone_number, name, match kind, distance) tuples, best first
+        """
+        key = search_key(query)
+        lowered = normalize_name(query.strip())
+        candidates = {}
+
+        def add(rows, match, distance_of=lambda row: 0):
+            for row in rows:
+                if row[0] not in candidates:
+                    candidates[row[0]] = (row[0], row[1], row[2], match, distance_of(row))
+
+        digits = phone_key(query)
+        if digits and not any(char.isalpha() for char in key):
+            add(ContactModel.find_by_phone(account_id, digits, limit), MATCH_PHONE)
+
+        if key:
+            rows = ContactModel.find_by_name(account_id, key, limit)
+            add([row for row in rows if row[3] == lowered], MATCH_EXACT)
+            add(rows, MATCH_NORMALIZED)
+
+        if key and len(candidates) < limit:
+            add(ContactModel.find_by_prefix(account_id, key, limit), MATCH_PREFIX,
+                lambda row: len(row[4]) - len(key))
+
+        max_distance = min(RESOLVE_FUZZY_MAX_DISTANCE, len(key) // 4)
+        if max_distance and len(candidates) < limit:
+            matches = []
+            query_key = fuzzy_key(key)
+            single_word = ' ' not in key
+            for contact_id, name_key, words in _search_keys.get(account_id, _load_search_keys):
+                if contact_id in candidates:
+                    continue
+                distance = within_distance(query_key, name_key, max_distance)
+                if distance is None and single_word and words:
+                    # A single typed word may be one word of a longer name
+                    distances = [d for d in (within_distance(query_key, word, max_distance) for word in words)
+                                 if d is not None]
+                    distance = min(distances) if distances else None
+                if distance is not None:
+                    matches.append((distance, name_key[0], contact_id))
+            matches.sort()
+            distances = {contact_id: distance for distance, _, contact_id in matches[:limit - len(candidates)]}
+            add(ContactModel.get_many(account_id, list(distances)), MATCH_FUZZY, lambda row: distances[row[0]])
+
+        ranked = sorted(candidates.values(), key=lambda c: (_MATCH_RANK[c[3]], c[4], c[2]))
+        return ranked[:limit]
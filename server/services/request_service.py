@@ -1,6 +1,23 @@
-from database.models import RequestModel, ResultModel
+import time
+from database.models import RequestModel, ResultModel, ArchiveModel
+from utils.notifier import pending_notifier
+from utils.pending_index import pending_index
+from utils.cursor import encode_cursor, decode_cursor
+from utils.units import to_minor_units
+from config import (
+    CLAIM_BATCH_MAX,
+    LEASE_SECONDS,
+    MAX_ATTEMPTS,
+    REAPER_BATCH_SIZE,
+    LONG_POLL_MAX_WAIT,
+    LONG_POLL_RECHECK_SECONDS,
+    SSE_BATCH_SIZE,
+    SSE_KEEPALIVE_SECONDS,
+    SSE_MAX_DURATION,
+)
 from constants import (
-    STATUS_PROCESSING,
+    ERROR_INVALID_CURSOR,
+    RESULT_RECORDED,
     STATUS_DONE,
     STATUS_FAILED,
     STATUS_SUCCESS
@@ -12,27 +29,186 @@ class RequestService:
     
     @staticmethod
     def create_request(account_id, phone_number, amount):
-        """Create a new request"""
-        return RequestModel.add(account_id, phone_number, amount)
+        """Create a new request and wake any poller waiting on the account"""
+        request_id, created_at = RequestModel.add(account_id, phone_number, to_minor_units(amount))
+        pending_index.push(account_id, [(request_id, created_at)])
+        pending_notifier.notify(account_id)
+        return request_id
+    
+    @staticmethod
+    def create_requests(account_id, items):
+        """Create many requests in a single transaction and return their ids"""
+        if not items:
+            return []
+        request_ids, created_at = RequestModel.add_many(
+            account_id, [(phone_number, to_minor_units(amount)) for phone_number, amount in items]
+        )
+        pending_index.push(account_id, [(request_id, created_at) for request_id in request_ids])
+        pending_notifier.notify(account_id)
+        return request_ids
+    
+    @staticmethod
+    def get_next_pending(account_id, wait=0):
+        """Claim the next pending request by marking it as processing"""
+        requests = RequestService.claim_pending(account_id, 1, wait)
+        return requests[0] if requests else None
+
+    @staticmethod
+    def claim_pending(account_id, limit, wait=0):
+        """
+        Claim up to `limit` pending requests, oldest first
+
+        With `wait` > 0 the call blocks for up to that many seconds until a
+        request is created for the account. Creations in this process wake
+        the waiter immediately; ones made by other worker processes arrive
+        through the change log within COHERENCE_POLL_SECONDS, with a recheck
+        every LONG_POLL_RECHECK_SECONDS as a fallback.
+
+        An account the pending index knows to be empty is answered without
+        a database query.
+        """
+        limit = min(max(limit, 1), CLAIM_BATCH_MAX)
+        deadline = time.monotonic() + min(max(wait, 0), LONG_POLL_MAX_WAIT)
+        while True:
+            version = pending_notifier.version(account_id)
+            requests = []
+            if pending_index.may_have_pending(account_id):
+                sequence = pending_index.sequence()
+                requests = RequestModel.claim(account_id, limit, LEASE_SECONDS)
+                pending_index.discard(account_id, [row[0] for row in requests])
+                if len(requests) < limit:
+                    pending_index.confirm_empty(account_id, sequence)
+            remaining = deadline - time.monotonic()
+            if requests or remaining <= 0:
+                return requests
+            pending_notifier.wait(account_id, version, min(remaining, LONG_POLL_RECHECK_SECONDS))
     
     @staticmethod
-    def get_next_pending(account_id):
-        """Get the next pending request and mark it as processing"""
-        request = RequestModel.get_next(account_id)
-        if request:
-            request_id = request[0]
-            RequestModel.update_status(account_id, request_id, STATUS_PROCESSING)
-        return request
+    def watch_pending(account_id, last_id=0):
+        """
+        Yield pending requests created after `last_id` as they appear
+
+        Requests are not claimed; the device still claims them through
+        /requests/next. Yields None whenever SSE_KEEPALIVE_SECONDS pass
+        without a new request so the caller can keep the connection alive.
+        Stops after SSE_MAX_DURATION so long-lived connections get recycled.
+        """
+        deadline = time.monotonic() + SSE_MAX_DURATION
+        last_sent = time.monotonic()
+        while time.monotonic() < deadline:
+            version = pending_notifier.version(account_id)
+            rows = RequestModel.get_pending_after(account_id, last_id, SSE_BATCH_SIZE)
+            for row in rows:
+                last_id = row[0]
+                yield row
+            if rows:
+                last_sent = time.monotonic()
+                continue
+
+            now = time.monotonic()
+            if now - last_sent >= SSE_KEEPALIVE_SECONDS:
+                last_sent = now
+                yield None
+            timeout = min(LONG_POLL_RECHECK_SECONDS, last_sent + SSE_KEEPALIVE_SECONDS - now, deadline - now)
+            pending_notifier.wait(account_id, version, max(timeout, 0))
     
     @staticmethod
-    def add_result(account_id, request_id, status, message):
+    def add_result(account_id, request_id, status, message, lease_token=None):
         """Add result for a request and update its status"""
-        ResultModel.add(account_id, request_id, status, message)
-        final_status = STATUS_DONE if status == STATUS_SUCCESS else STATUS_FAILED
-        RequestModel.update_status(account_id, request_id, final_status)
+        return RequestService.add_results(account_id, [(request_id, status, message, lease_token)])[0]
+
+    @staticmethod
+    def add_results(account_id, results):
+        """
+        Record many (request_id, status, message, lease_token) results in one transaction
+
+        Results for requests that already have a final status are skipped,
+        so a device can safely replay them after a retry. A result carrying a
+        lease token from an expired or superseded claim is rejected as stale.
+        """
+        outcomes = ResultModel.record_many(account_id, [
+            (request_id, status, STATUS_DONE if status == STATUS_SUCCESS else STATUS_FAILED, message, lease_token)
+            for request_id, status, message, lease_token in results
+        ])
+        # Without a lease token a result may finish a request that was never claimed
+        pending_index.discard(account_id, [
+            request_id for (request_id, *_), (outcome, _) in zip(results, outcomes) if outcome == RESULT_RECORDED
+        ])
+        return outcomes
+
+    @staticmethod
+    def reap_expired_leases():
+        """Requeue requests whose device never reported back; fail them after MAX_ATTEMPTS"""
+        while True:
+            requeued, failed = RequestModel.reap_expired_leases(MAX_ATTEMPTS, REAPER_BATCH_SIZE)
+            by_account = {}
+            for request_id, account_id, created_at in requeued:
+                by_account.setdefault(account_id, []).append((request_id, created_at))
+            for account_id, items in by_account.items():
+                pending_index.push(account_id, items)
+                pending_notifier.notify(account_id)
+            if len(requeued) < REAPER_BATCH_SIZE and failed < REAPER_BATCH_SIZE:
+                return
+    
+    @staticmethod
+    def on_pending_changed(account_id):
+        """Change-log handler: another worker created or requeued requests for the account"""
+        pending_index.invalidate(account_id)
+        if account_id is None:
+            pending_notifier.notify_all()
+        else:
+            pending_notifier.notify(account_id)
+
+    @staticmethod
+    def rebuild_pending_index():
+        """Load every pending request into the in-process pending index"""
+        pending_index.rebuild(RequestModel.get_all_pending())
+
+    @staticmethod
+    def get_queue_depths():
+        """
+        Get (account_id, status, count) of pending and processing requests
+
+        Read from the database rather than the pending index, which only
+        knows the pending requests this process has seen.
+        """
+        return RequestModel.count_active()
+
+    @staticmethod
+    def get_history(account_id, limit, cursor=None, statuses=None, as_json=False):
+        """
+        Get one page of request history and the cursor for the next page
+
+        Cursors are opaque url-safe strings encoding the (created_at, id) of
+        the last row returned.
+
+        Returns:
+            tuple: (rows, next_cursor or None); with `as_json` the rows are
+            JSON object strings
+
+        Raises:
+            ValueError: if the cursor cannot be decoded
+        """
+        after = None
+        if cursor:
+            after = decode_cursor(cursor)
+            if not all(isinstance(value, int) for value in after):
+                raise ValueError(ERROR_INVALID_CURSOR)
+        rows = RequestModel.get_page(account_id, limit + 1, after, statuses, as_json)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(last[1], last[2]) if as_json else encode_cursor(last[4], last[0])
+        if as_json:
+            rows = [row[0] for row in rows]
+        return rows, next_cursor
     
     @staticmethod
     def get_request_by_id(account_id, request_id):
-        """Get request by ID"""
-        return RequestModel.get_by_id(account_id, request_id)
+        """Get request by ID, falling back to the archive for old finished requests"""
+        row = RequestModel.get_by_id(account_id, request_id)
+        if row is None:
+            row = ArchiveModel.get_by_id(account_id, request_id)
+        return row
     
@@ -0,0 +1,63 @@
+"""
+Retention: archive old finished requests and give the space back
+
+Usage (from the server directory):
+    python -m services.retention_service           # run one retention pass now
+    python -m services.retention_service --vacuum  # one-off VACUUM to enable incremental vacuum
+"""
+import argparse
+from database.models import Database, ArchiveModel, init_db
+from utils.units import now_ms
+from config import (
+    RETENTION_DAYS,
+    RETENTION_BATCH_SIZE,
+    RETENTION_VACUUM_PAGES,
+)
+
+
+class RetentionService:
+    """Business logic for request retention"""
+
+    @staticmethod
+    def run():
+        """
+        Archive finished requests older than RETENTION_DAYS, one bounded batch at a time
+
+        Each batch holds the write lock only for its own delete, and the
+        pages it freed are released with an incremental vacuum of at most
+        RETENTION_VACUUM_PAGES pages so writers never wait on a full VACUUM.
+
+        Returns:
+            int: number of requests archived
+        """
+        if RETENTION_DAYS <= 0:
+            return 0
+        before = now_ms() - RETENTION_DAYS * 86400000
+        archived = 0
+        while True:
+            moved = ArchiveModel.archive_finished(before, RETENTION_BATCH_SIZE)
+            if moved:
+                ArchiveModel.incremental_vacuum(RETENTION_VACUUM_PAGES)
+            archived += moved
+            if moved < RETENTION_BATCH_SIZE:
+                return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--vacuum', action='store_true',
+                        help="rebuild the database once so auto_vacuum=INCREMENTAL takes effect")
+    args = parser.parse_args()
+
+    init_db()
+    if args.vacuum:
+        with Database() as c:
+            # Pooled connections set auto_vacuum=INCREMENTAL; VACUUM applies it
+            c.execute("VACUUM")
+            c.execute("PRAGMA auto_vacuum")
+            print(f"auto_vacuum={c.fetchone()[0]}")
+    print(f"archived {RetentionService.run()} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Shared test setup
+
+The server modules are imported the way main.py imports them, with the
+server directory on sys.path. config.py and utils/auth.py read the
+environment at import, so the throwaway databases, JWT secret, statement
+profiling and admin account are set before anything from the server is
+imported.
+"""
+import os
+import sys
+import tempfile
+
+import jwt
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+_DATA_DIR = tempfile.mkdtemp(prefix="easytransfer-tests-")
+os.environ['DB_NAME'] = os.path.join(_DATA_DIR, "db.sqlite3")
+os.environ['ARCHIVE_DB_NAME'] = os.path.join(_DATA_DIR, "archive.sqlite3")
+os.environ['METRICS_DIR'] = os.path.join(_DATA_DIR, "metrics")
+os.environ['JWT_SECRET'] = 'test-secret'
+os.environ['DB_PROFILE'] = 'true'
+os.environ['ADMIN_ACCOUNT_IDS'] = '1'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from main import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_headers(account_id):
+    """Authorization header carrying a token for `account_id`"""
+    token = jwt.encode({'sub': str(account_id)}, os.environ['JWT_SECRET'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
@@ -0,0 +1,49 @@
+"""Amounts are stored as integer minor units, so finer amounts must be rejected, not rounded"""
+import pytest
+
+from conftest import auth_headers
+from utils.units import to_minor_units
+from utils.validation import validate_amount
+
+
+@pytest.mark.parametrize('amount', ["45.50", "45.5", 45.5, "45.500", 100, "1e2", "0.01"])
+def test_valid_amounts(amount):
+    assert validate_amount(amount) == (True, None)
+
+
+@pytest.mark.parametrize('amount', ["0.001", 0.001, 0.005, "1.005", "1e-3", 0.1 + 0.2])
+def test_amounts_finer_than_minor_units_are_rejected(amount):
+    is_valid, error = validate_amount(amount)
+    assert not is_valid
+    assert error == "Amount has too many decimal places"
+
+
+@pytest.mark.parametrize('amount', ["0.00", 0, -1])
+def test_amounts_must_be_positive(amount):
+    assert validate_amount(amount) == (False, "Amount must be greater than 0")
+
+
+@pytest.mark.parametrize('amount, minor', [("45.50", 4550), (45.5, 4550), ("0.01", 1), (100, 10000)])
+def test_valid_amounts_convert_exactly(amount, minor):
+    assert to_minor_units(amount) == minor
+
+
+def test_create_request_rejects_sub_minor_amount(client):
+    response = client.post('/requests/', json={'phone_number': "0912345678", 'amount': 0.001},
+                           headers=auth_headers(1))
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Amount has too many decimal places"
+
+    response = client.get('/requests/next', headers=auth_headers(1))
+    assert response.get_json()['status'] != 'ok'
+
+
+def test_batch_rejects_sub_minor_amount_per_item(client):
+    response = client.post('/requests/batch', json={'requests': [
+        {'phone_number': "0912345678", 'amount': "12.50"},
+        {'phone_number': "0912345678", 'amount': "0.004"},
+    ]}, headers=auth_headers(2))
+    body = response.get_json()
+    assert body['created'] == 1
+    assert body['failed'] == 1
+    assert body['results'][1]['error'] == "Amount has too many decimal places"
@@ -0,0 +1,14 @@
+"""Statement profiling, which the test environment turns on"""
+from conftest import auth_headers
+
+
+def test_profiled_statements_are_served_to_admins(client):
+    client.post('/requests/', json={'phone_number': "0912345678", 'amount': 10}, headers=auth_headers(1))
+    response = client.get('/admin/queries?limit=500', headers=auth_headers(1))
+    body = response.get_json()
+    assert body['profiling'] is True
+    assert any(statement['operation'] == 'RequestModel.add' for statement in body['statements'])
+
+
+def test_profile_is_admin_only(client):
+    assert client.get('/admin/queries', headers=auth_headers(2)).status_code == 403
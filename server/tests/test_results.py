@@ -0,0 +1,33 @@
+"""Reporting a result for a single request"""
+from conftest import auth_headers
+from constants import ERROR_REQUEST_NOT_FOUND
+
+
+def create_request(client, account_id):
+    response = client.post('/requests/', json={'phone_number': "0912345678", 'amount': 10},
+                           headers=auth_headers(account_id))
+    return response.get_json()['request_id']
+
+
+def test_result_is_recorded(client):
+    request_id = create_request(client, 10)
+    response = client.post(f'/requests/{request_id}/result', json={'status': 'Success'},
+                           headers=auth_headers(10))
+    assert response.status_code == 200
+    assert response.get_json()['final_status'] == 'Success'
+
+
+def test_result_for_unknown_request_is_404(client):
+    response = client.post('/requests/999999/result', json={'status': 'Success'}, headers=auth_headers(11))
+    assert response.status_code == 404
+    assert response.get_json()['error'] == ERROR_REQUEST_NOT_FOUND
+
+
+def test_result_for_another_accounts_request_is_404(client):
+    request_id = create_request(client, 12)
+    response = client.post(f'/requests/{request_id}/result', json={'status': 'Success'},
+                           headers=auth_headers(13))
+    assert response.status_code == 404
+
+    response = client.get(f'/requests/status/{request_id}', headers=auth_headers(12))
+    assert response.get_json()['status'] == 'Pending'
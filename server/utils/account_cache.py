@@ -0,0 +1,46 @@
+"""
+Bounded per-account cache of values loaded from the database
+"""
+import threading
+from collections import OrderedDict
+
+
+class AccountCache:
+    """
+    LRU of one value per account, filled on demand by a loader
+
+    A load that overlaps an invalidation is not stored, so a value read
+    before a write can never be cached after that write's invalidation.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._values = OrderedDict()
+        self._generation = 0
+
+    def get(self, account_id, loader):
+        """Return the cached value of an account, calling `loader(account_id)` on a miss"""
+        with self._lock:
+            if account_id in self._values:
+                self._values.move_to_end(account_id)
+                return self._values[account_id]
+            generation = self._generation
+
+        value = loader(account_id)
+
+        with self._lock:
+            if generation == self._generation and self.size > 0:
+                self._values[account_id] = value
+                while len(self._values) > self.size:
+                    self._values.popitem(last=False)
+        return value
+
+    def invalidate(self, account_id=None):
+        """Drop the value of one account, or of every account"""
+        with self._lock:
+            self._generation += 1
+            if account_id is None:
+                self._values.clear()
+            else:
+                self._values.pop(account_id, None)
@@ -2,11 +2,16 @@
 JWT Authentication utilities
 """
 import jwt
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
 import os
 from dotenv import load_dotenv
-from constants import ERROR_TOKEN_NOT_PROVIDED, ERROR_INVALID_TOKEN
+from config import AUTH_CACHE_SIZE, ADMIN_ACCOUNT_IDS
+from constants import ERROR_TOKEN_NOT_PROVIDED, ERROR_INVALID_TOKEN, ERROR_ADMIN_ONLY
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +23,78 @@ JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
 if not JWT_SECRET:
     raise ValueError("JWT_SECRET environment variable is not set")
 
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens
+
+    Entries are keyed by the SHA-256 digest of the token, so raw tokens are
+    never kept in memory, and hold the account id from ``sub`` together with
+    the token's ``exp``. Only tokens that passed full verification are
+    stored; an entry past its ``exp`` is dropped on lookup.
+
+    JWT_SECRET is read once at import, so rotating it means restarting the
+    workers, which also starts every cache empty.
+    """
+
+    def __init__(self, size=AUTH_CACHE_SIZE):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        """Return the cached account id of a token, or None on a miss"""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                account_id, exp = entry
+                if exp is None or time.time() < exp:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return account_id
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, account_id, exp):
+        """Remember a verified token"""
+        if self.size <= 0:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (account_id, exp)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+token_cache = TokenCache()
+
+
+def token_cache_metrics():
+    """Metrics collector (utils/metrics.py) exporting the token cache's counters"""
+    stats = token_cache.stats()
+    return {
+        'counters': {
+            ('easytransfer_auth_cache_hits_total', ()): stats['hits'],
+            ('easytransfer_auth_cache_misses_total', ()): stats['misses'],
+        },
+        'gauges': {('easytransfer_auth_cache_size', ()): stats['size']},
+    }
+
+
 def verify_token(token):
     """
     Verify and decode a JWT token
@@ -37,6 +114,31 @@ def verify_token(token):
         return None
 
 
+def verify_account_id(token):
+    """
+    Verify a JWT token and return its account id, using the token cache
+
+    A token seen before costs one dictionary lookup; anything else goes
+    through ``verify_token`` and is cached only if it is valid.
+
+    Args:
+        token: JWT token string
+
+    Returns:
+        int: Account ID from ``sub`` or None if the token is invalid
+    """
+    account_id = token_cache.get(token)
+    if account_id is not None:
+        return account_id
+
+    payload = verify_token(token)
+    if not payload:
+        return None
+    account_id = int(payload.get('sub'))
+    token_cache.put(token, account_id, payload.get('exp'))
+    return account_id
+
+
 def get_token_from_request():
     """
     Extract JWT token from request headers
@@ -61,10 +163,7 @@ def get_account_id_from_token():
     if not token:
         return None
     
-    payload = verify_token(token)
-    if payload:
-        return int(payload.get('sub'))
-    return None
+    return verify_account_id(token)
 
 
 def require_auth(f):
@@ -78,12 +177,26 @@ def require_auth(f):
         if not token:
             return jsonify({'error': ERROR_TOKEN_NOT_PROVIDED}), 401
         
-        payload = verify_token(token)
-        if not payload:
+        account_id = verify_account_id(token)
+        if account_id is None:
             return jsonify({'error': ERROR_INVALID_TOKEN}), 401
         
         # Add account_id to kwargs for the route function
-        kwargs['account_id'] = int(payload.get('sub'))
+        kwargs['account_id'] = account_id
+        return f(*args, **kwargs)
+    
+    return decorated_function
+
+
+def require_admin(f):
+    """
+    Decorator to restrict a route to the accounts listed in ADMIN_ACCOUNT_IDS
+    """
+    @require_auth
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if kwargs['account_id'] not in ADMIN_ACCOUNT_IDS:
+            return jsonify({'error': ERROR_ADMIN_ONLY}), 403
         return f(*args, **kwargs)
     
     return decorated_function
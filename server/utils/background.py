@@ -0,0 +1,30 @@
+"""
+Periodic background jobs run inside each worker process
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def start_periodic(name, interval, job):
+    """
+    Run `job` every `interval` seconds on a daemon thread
+
+    Exceptions are logged and the job keeps its schedule, so a transient
+    error such as a locked database never stops the loop.
+
+    Returns:
+        threading.Event: set it to stop the job
+    """
+    stopped = threading.Event()
+
+    def run():
+        while not stopped.wait(interval):
+            try:
+                job()
+            except Exception:
+                logger.exception("Background job %s failed", name)
+
+    threading.Thread(target=run, name=name, daemon=True).start()
+    return stopped
@@ -0,0 +1,117 @@
+"""
+Cross-worker cache coherence through the SQLite change log
+
+Every write that other processes may have cached records a (topic,
+account_id) row in the ``changes`` table in the same transaction. Each
+worker runs a listener that watches ``PRAGMA data_version`` on its own
+connection, which changes only when another connection commits, and then
+reads the new change rows and hands them to the subscribers of their topic.
+No broker is involved; the database file is the only shared state.
+"""
+import logging
+import os
+import threading
+import time
+from database.models import ChangeModel
+from database.pool import connect
+from utils.background import start_periodic
+from utils.units import now_ms
+from config import (
+    DB_NAME,
+    COHERENCE_POLL_SECONDS,
+    CHANGE_LOG_SECONDS,
+    CHANGE_PRUNE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """
+    Dispatches changes made by other worker processes to subscribers
+
+    A subscriber is called with the account id of each change on its topic,
+    or with None when the listener fell behind the pruned log and can no
+    longer tell what changed, in which case everything must be invalidated.
+    """
+
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._conn = None
+        self._data_version = None
+        self._last_seq = None
+        self._last_prune = 0
+        self._stopped = None
+
+    def subscribe(self, topic, handler):
+        """Call `handler(account_id)` for every change on `topic` made by another process"""
+        with self._lock:
+            self._subscribers.setdefault(topic, []).append(handler)
+
+    def start(self, interval=COHERENCE_POLL_SECONDS):
+        """
+        Start listening from the current end of the log
+
+        Call this before loading any state from the database so that no
+        change made while loading can be missed.
+        """
+        self._last_seq = ChangeModel.last_seq()
+        self._stopped = start_periodic('coherence', interval, self.poll)
+        return self._stopped
+
+    def stop(self):
+        """Stop the listener thread"""
+        if self._stopped is not None:
+            self._stopped.set()
+
+    def poll(self):
+        """Dispatch any changes committed since the last poll"""
+        if self._conn is None:
+            self._conn = connect(DB_NAME)
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._dispatch_new()
+
+        if time.monotonic() - self._last_prune >= CHANGE_PRUNE_SECONDS:
+            self._last_prune = time.monotonic()
+            ChangeModel.prune(now_ms() - CHANGE_LOG_SECONDS * 1000)
+
+    def _dispatch_new(self):
+        pid = os.getpid()
+        while True:
+            rows = ChangeModel.get_after(self._last_seq, self.BATCH_SIZE)
+            if not rows:
+                return
+            # Sequence numbers have no gaps, so a jump means rows were pruned unseen
+            if rows[0][0] != self._last_seq + 1:
+                logger.warning("Change log skipped from %s to %s; invalidating everything",
+                               self._last_seq, rows[0][0])
+                self._publish_all()
+            for seq, topic, account_id, origin in rows:
+                if origin != pid:
+                    self._publish(topic, account_id)
+                self._last_seq = seq
+            if len(rows) < self.BATCH_SIZE:
+                return
+
+    def _publish(self, topic, account_id):
+        with self._lock:
+            handlers = list(self._subscribers.get(topic, ()))
+        for handler in handlers:
+            try:
+                handler(account_id)
+            except Exception:
+                logger.exception("Change handler for %s failed", topic)
+
+    def _publish_all(self):
+        with self._lock:
+            topics = list(self._subscribers)
+        for topic in topics:
+            self._publish(topic, None)
+
+
+change_listener = ChangeListener()
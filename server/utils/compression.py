@@ -0,0 +1,60 @@
+"""
+Response compression negotiated from Accept-Encoding
+
+Bodies of at least COMPRESS_MIN_BYTES are compressed with brotli when the
+optional ``brotli`` package is installed and the client accepts it, and
+with gzip otherwise. Streams (the SSE endpoints), empty and non-2xx
+responses are left alone. A compressed response keeps a strong ETag that
+names its encoding, e.g. ``"contacts-1-4-gzip"``.
+"""
+import gzip
+from flask import request
+from config import COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'text/plain', 'text/html'}
+
+# Encoding -> compress function, in order of preference
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda data: brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY)
+# mtime=0 keeps the output, and so the ETag, identical for identical bodies
+ENCODERS['gzip'] = lambda data: gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def etag_variants(etag):
+    """Return every ETag a client may hold for a representation: plain and per encoding"""
+    return [etag] + [f"{etag}-{encoding}" for encoding in ENCODERS]
+
+
+def compress_response(response):
+    """after_request hook: compress the body if the client accepts an encoding we offer"""
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    encoding = request.accept_encodings.best_match(list(ENCODERS))
+    if encoding is None:
+        return response
+
+    response.set_data(ENCODERS[encoding](data))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def init_compression(app):
+    """Compress the app's responses"""
+    app.after_request(compress_response)
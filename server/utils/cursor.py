@@ -0,0 +1,29 @@
+"""
+Opaque keyset pagination cursors
+"""
+import base64
+import json
+from constants import ERROR_INVALID_CURSOR
+
+
+def encode_cursor(*values):
+    """Encode the sort key of the last row of a page"""
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError(ERROR_INVALID_CURSOR)
+    if not isinstance(values, list) or len(values) != 2:
+        raise ValueError(ERROR_INVALID_CURSOR)
+    return values
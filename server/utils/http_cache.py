@@ -0,0 +1,27 @@
+"""
+Conditional GET helpers: strong ETags and 304 Not Modified
+"""
+from flask import current_app, request
+from utils.compression import etag_variants
+
+
+def not_modified(etag):
+    """
+    Return a 304 response if the client already holds `etag`, else None
+
+    Call this before loading or serializing the body so a revalidation
+    costs only the version lookup.
+    """
+    # A client that received a compressed body holds the encoding's ETag
+    for variant in etag_variants(etag):
+        if request.if_none_match.contains_weak(variant):
+            response = current_app.response_class(status=304)
+            return with_etag(response, variant)
+    return None
+
+
+def with_etag(response, etag):
+    """Attach a strong ETag and make clients revalidate before reusing the body"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
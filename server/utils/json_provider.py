@@ -0,0 +1,106 @@
+"""
+JSON encoding for API responses
+
+The provider is chosen with JSON_PROVIDER. ``orjson`` encodes with the
+orjson package when it is installed and otherwise behaves exactly like
+``stdlib``, Flask's own provider with non-ASCII text left unescaped. Both
+produce the same bytes: compact, keys sorted, UTF-8.
+
+Large lists can skip Python dicts altogether: the models render each row
+with SQLite's json_object() and ``jsonify_fragments`` splices those
+pre-encoded fragments into the response body.
+"""
+import logging
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's default provider, keeping Arabic names readable in the body"""
+
+    ensure_ascii = False
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    StdlibJSONProvider that encodes and decodes with orjson
+
+    Dates, dataclasses and anything orjson does not know are passed to the
+    same `default` hook as the stdlib provider, so the output is the same.
+    Pretty-printed debug output and calls with extra json.dumps arguments
+    go through the stdlib.
+    """
+
+    if orjson is not None:
+        OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                   | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+    def _encode(self, obj):
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+
+    def _pretty(self):
+        return self.compact is False or (self.compact is None and self._app.debug)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if self._pretty():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'stdlib': StdlibJSONProvider,
+    'orjson': OrjsonProvider,
+}
+
+
+def get_json_provider(name):
+    """Return the provider class configured by JSON_PROVIDER"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown JSON_PROVIDER {name!r}; expected one of {', '.join(PROVIDERS)}")
+    if name == 'orjson' and orjson is None:
+        logger.info("orjson is not installed; using the stdlib JSON provider")
+        return StdlibJSONProvider
+    return PROVIDERS[name]
+
+
+class Fragment(str):
+    """Text that is already valid JSON and is copied into the body as is"""
+
+
+def fragment_array(fragments):
+    """Join pre-encoded JSON values into one JSON array"""
+    return Fragment('[' + ','.join(fragments) + ']')
+
+
+def jsonify_fragments(**fields):
+    """
+    jsonify() for an object whose members may be Fragments
+
+    Members are written in sorted key order like every other response;
+    Fragment values are spliced in and everything else is encoded by the
+    app's provider.
+    """
+    dumps = current_app.json.dumps
+    members = ','.join(
+        f'{dumps(key)}:{value if isinstance(value, Fragment) else dumps(value)}'
+        for key, value in sorted(fields.items())
+    )
+    return current_app.response_class('{' + members + '}\n', mimetype=current_app.json.mimetype)
@@ -0,0 +1,219 @@
+"""
+Prometheus metrics shared by every worker process
+
+Each process keeps its counters and histograms in memory, where recording
+an observation is a dict update under a lock, and writes them to its own
+file in METRICS_DIR every METRICS_FLUSH_SECONDS. GET /metrics flushes the
+serving process and merges the files of all processes, so a scrape that
+lands on any gunicorn worker reports the totals of all of them. Files of
+exited processes are kept so their counts are not lost; their gauges are
+dropped.
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from flask import g, request
+from config import METRICS_DIR, METRICS_FLUSH_SECONDS
+from utils.background import start_periodic
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'easytransfer_http_requests_total':
+        ('counter', 'HTTP requests by blueprint, route, method and status code'),
+    'easytransfer_http_request_duration_seconds':
+        ('histogram', 'Time to produce the response (headers only for streams)'),
+    'easytransfer_db_wait_seconds':
+        ('histogram', 'Time waiting for a pooled connection, by model method'),
+    'easytransfer_db_query_duration_seconds':
+        ('histogram', 'Time inside one Database block (one transaction) once connected, by model method'),
+    'easytransfer_queue_depth':
+        ('gauge', 'Requests waiting for or held by a device, by account and status'),
+    'easytransfer_auth_cache_hits_total':
+        ('counter', 'Tokens answered from the verified-token cache'),
+    'easytransfer_auth_cache_misses_total':
+        ('counter', 'Tokens that needed a full JWT verification'),
+    'easytransfer_auth_cache_size':
+        ('gauge', 'Tokens held in the verified-token cache'),
+}
+
+
+class Metrics:
+    """
+    In-process counters and histograms with file-based aggregation
+
+    Labels are passed as tuples of (name, value) pairs in a fixed order.
+    Collectors registered with ``add_collector`` are called on every flush
+    and return {'counters': {...}, 'gauges': {...}} of absolute values,
+    for state that is already counted elsewhere, such as the token cache.
+    """
+
+    def __init__(self, directory, buckets=LATENCY_BUCKETS):
+        self.directory = directory
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+        self._stopped = None
+
+    def inc(self, name, labels=(), value=1):
+        """Add `value` to a counter"""
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        """Record one observation in a histogram"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                # One count per bucket plus +Inf, then the sum
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def add_collector(self, collector):
+        """Call `collector()` on every flush to export absolute counters and gauges"""
+        self._collectors.append(collector)
+
+    def start(self, interval=METRICS_FLUSH_SECONDS):
+        """Flush this process's metrics to METRICS_DIR periodically"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopped = start_periodic('metrics', interval, self.flush)
+        return self._stopped
+
+    def flush(self):
+        """Write this process's metrics to its file, atomically"""
+        counters, gauges = {}, {}
+        for collector in self._collectors:
+            collected = collector()
+            counters.update(collected.get('counters', {}))
+            gauges.update(collected.get('gauges', {}))
+        with self._lock:
+            counters.update(self._counters)
+            histograms = {key: list(value) for key, value in self._histograms.items()}
+
+        pid = os.getpid()
+        path = os.path.join(self.directory, f"{pid}.json")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump({
+                'pid': pid,
+                'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+                'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+                'histograms': [[name, labels, value] for (name, labels), value in histograms.items()],
+            }, f)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """Flush, then merge the files of every process into (counters, gauges, histograms)"""
+        self.flush()
+        counters, gauges, histograms = {}, {}, {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed or replaced while listing
+            for name, labels, value in data['counters']:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            if _alive(data['pid']):
+                for name, labels, value in data['gauges']:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, value in data['histograms']:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.get(key)
+                histograms[key] = value if merged is None else [a + b for a, b in zip(merged, value)]
+        return counters, gauges, histograms
+
+    def render(self, gauges=None):
+        """
+        Return the merged metrics in the Prometheus text exposition format
+
+        `gauges` adds {(name, labels): value} computed by the caller, such
+        as values read from the database at scrape time.
+        """
+        counters, merged_gauges, histograms = self.collect()
+        merged_gauges.update(gauges or {})
+
+        # name -> [(labels, sample lines)]
+        series = {}
+        for (name, labels), value in list(counters.items()) + list(merged_gauges.items()):
+            series.setdefault(name, []).append((labels, [_sample(name, labels, value)]))
+        for (name, labels), value in histograms.items():
+            lines = []
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), value):
+                cumulative += count
+                lines.append(_sample(f"{name}_bucket", labels + (('le', _format(bound)),), cumulative))
+            lines.append(_sample(f"{name}_sum", labels, value[-1]))
+            lines.append(_sample(f"{name}_count", labels, cumulative))
+            series.setdefault(name, []).append((labels, lines))
+
+        output = []
+        for name, (kind, help_text) in METRICS.items():
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            for labels, lines in sorted(series.get(name, ()), key=lambda entry: entry[0]):
+                output.extend(lines)
+        return '\n'.join(output) + '\n'
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # Exists, owned by another user
+    return True
+
+
+def _format(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value):
+    if labels:
+        rendered = ','.join(f'{key}="{_escape(label)}"' for key, label in labels)
+        return f"{name}{{{rendered}}} {_format(value)}"
+    return f"{name} {_format(value)}"
+
+
+metrics = Metrics(METRICS_DIR)
+
+
+def init_request_metrics(app):
+    """Count and time every request by blueprint and route template"""
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return response
+        # The rule template keeps the label set bounded; unmatched URLs share one label
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        labels = (('blueprint', request.blueprint or ''), ('route', route), ('method', request.method))
+        metrics.observe('easytransfer_http_request_duration_seconds', labels, time.perf_counter() - started)
+        metrics.inc('easytransfer_http_requests_total', labels + (('status', str(response.status_code)),))
+        return response
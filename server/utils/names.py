@@ -0,0 +1,95 @@
+"""
+Contact name normalization
+
+Names are compared the way ContactService always compared them, case-
+insensitively. The normalized form is stored next to the name so the
+database can enforce uniqueness per account with an index.
+
+Lookups use a looser search key that also folds the spelling variants
+people type interchangeably: Latin accents, Arabic diacritics and tatweel,
+the alef/hamza forms, taa marbuta, alef maqsura, Persian letters and
+Arabic-Indic digits.
+"""
+import re
+import unicodedata
+
+_ARABIC_FOLDING = str.maketrans({
+    'ٱ': 'ا',  # alef wasla -> alef
+    'ى': 'ي',  # alef maqsura -> yeh
+    'ی': 'ي',  # farsi yeh -> yeh
+    'ة': 'ه',  # taa marbuta -> heh
+    'ک': 'ك',  # keheh -> kaf
+    'ـ': None,      # tatweel
+    **{chr(0x0660 + digit): str(digit) for digit in range(10)},  # Arabic-Indic digits
+    **{chr(0x06f0 + digit): str(digit) for digit in range(10)},  # Extended Arabic-Indic digits
+})
+
+_SPACES = re.compile(r'\s+')
+_NOT_DIGITS = re.compile(r'\D')
+
+
+def normalize_name(name):
+    """Key used for duplicate detection: the lowercased name"""
+    return name.lower()
+
+
+def search_key(text):
+    """
+    Key used to look contacts up by name
+
+    NFKD splits hamza/madda forms of alef, waw and yeh and accented Latin
+    letters into a base letter plus combining marks, which are dropped
+    together with the Arabic diacritics.
+    """
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _SPACES.sub(' ', stripped.translate(_ARABIC_FOLDING).casefold()).strip()
+
+
+def phone_key(text):
+    """Key used to look contacts up by phone number: its digits only"""
+    return _NOT_DIGITS.sub('', text.translate(_ARABIC_FOLDING))
+
+
+def bounded_distance(a, b, max_distance):
+    """
+    Levenshtein distance between `a` and `b`, or None if it exceeds `max_distance`
+
+    Only a diagonal band of the matrix is computed and the scan stops as
+    soon as every cell in a row is over the bound.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i] + [max_distance + 1] * len(b)
+        start = max(1, i - max_distance)
+        end = min(len(b), i + max_distance)
+        for j in range(start, end + 1):
+            cost = 0 if char_a == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+        if min(current[start - 1:end + 1]) > max_distance:
+            return None
+        previous = current
+    return previous[-1] if previous[-1] <= max_distance else None
+
+
+def fuzzy_key(text):
+    """Precompute the (text, set of characters) pair that within_distance compares"""
+    return text, frozenset(text)
+
+
+def within_distance(query, candidate, max_distance):
+    """
+    bounded_distance between two fuzzy_key pairs, skipping hopeless pairs cheaply
+
+    Each edit changes the length by at most one and the set of characters
+    by at most two members, so pairs outside those bounds are rejected
+    without running the edit-distance loop.
+    """
+    (a, a_chars), (b, b_chars) = query, candidate
+    if abs(len(a) - len(b)) > max_distance or len(a_chars ^ b_chars) > 2 * max_distance:
+        return None
+    return bounded_distance(a, b, max_distance)
@@ -0,0 +1,66 @@
+"""
+In-process wake-up signals for pollers waiting on an account's queue
+"""
+import threading
+
+
+class AccountNotifier:
+    """
+    Per-account condition variables with a change counter
+
+    A waiter reads ``version(account_id)`` before checking the database and
+    then waits for the version to move, so a notification that lands between
+    the check and the wait is never lost.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conditions = {}
+        self._versions = {}
+        self._waiters = {}
+
+    def version(self, account_id):
+        """Return the current change counter of an account"""
+        with self._lock:
+            return self._versions.get(account_id, 0)
+
+    def notify(self, account_id):
+        """Wake every thread waiting on the account"""
+        with self._lock:
+            self._versions[account_id] = self._versions.get(account_id, 0) + 1
+            condition = self._conditions.get(account_id)
+            if condition is not None:
+                condition.notify_all()
+
+    def notify_all(self):
+        """Wake every waiting thread, whatever account it waits on"""
+        with self._lock:
+            for account_id, condition in self._conditions.items():
+                self._versions[account_id] = self._versions.get(account_id, 0) + 1
+                condition.notify_all()
+
+    def wait(self, account_id, since_version, timeout):
+        """
+        Block until the account changes after `since_version` or timeout expires
+
+        Returns:
+            bool: True if a change was signalled
+        """
+        with self._lock:
+            condition = self._conditions.get(account_id)
+            if condition is None:
+                condition = self._conditions[account_id] = threading.Condition(self._lock)
+            self._waiters[account_id] = self._waiters.get(account_id, 0) + 1
+            try:
+                return condition.wait_for(
+                    lambda: self._versions.get(account_id, 0) != since_version,
+                    timeout,
+                )
+            finally:
+                self._waiters[account_id] -= 1
+                if not self._waiters[account_id]:
+                    del self._waiters[account_id]
+                    del self._conditions[account_id]
+
+
+pending_notifier = AccountNotifier()
@@ -0,0 +1,145 @@
+"""
+In-process index of pending request ids per account
+
+SQLite stays the source of truth: the index only lets an empty poll skip
+the database. It is rebuilt from the requests table when a worker starts
+and kept current by the request service, which pushes ids on creation and
+requeue and drops them on claim or result.
+"""
+import heapq
+import threading
+import time
+from config import PENDING_INDEX_MAX_AGE
+
+
+class PendingIndex:
+    """
+    Per-account heaps of (created_at, id) for pending requests
+
+    Ids are removed lazily: the heap may still hold entries that were
+    claimed, which are skipped when read and dropped when the heap is
+    compacted. Every push gets a sequence number so that confirming an
+    account empty after a claim never drops an id pushed while that claim
+    was running.
+
+    Writes by other worker processes arrive through ``invalidate``. As a
+    safety net, an account reported empty is only trusted for `max_age`
+    seconds after the database last confirmed it, which bounds how long a
+    write nobody announced (a manual edit) can go unnoticed.
+    """
+
+    def __init__(self, max_age):
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._heaps = {}
+        self._ids = {}
+        self._checked_at = {}
+        self._built_at = None
+        self._sequence = 0
+
+    def rebuild(self, rows):
+        """Replace the index with (account_id, id, created_at) rows read from the database"""
+        with self._lock:
+            self._heaps = {}
+            self._ids = {}
+            self._checked_at = {}
+            for account_id, request_id, created_at in rows:
+                self._sequence += 1
+                self._heaps.setdefault(account_id, []).append((created_at, request_id))
+                self._ids.setdefault(account_id, {})[request_id] = self._sequence
+            for heap in self._heaps.values():
+                heapq.heapify(heap)
+            self._built_at = time.monotonic()
+
+    def push(self, account_id, items):
+        """Record (id, created_at) pairs that just became pending"""
+        with self._lock:
+            heap = self._heaps.setdefault(account_id, [])
+            ids = self._ids.setdefault(account_id, {})
+            for request_id, created_at in items:
+                self._sequence += 1
+                if request_id not in ids:
+                    heapq.heappush(heap, (created_at, request_id))
+                ids[request_id] = self._sequence
+
+    def sequence(self):
+        """Return the current push sequence, read before querying the database"""
+        with self._lock:
+            return self._sequence
+
+    def may_have_pending(self, account_id):
+        """Return False only when the account is known to have nothing pending"""
+        with self._lock:
+            if self._built_at is None or self._ids.get(account_id):
+                return True
+            checked_at = self._checked_at.get(account_id, self._built_at)
+            return time.monotonic() - checked_at >= self.max_age
+
+    def invalidate(self, account_id=None):
+        """Make the next poll of an account, or of every account, check the database"""
+        with self._lock:
+            if self._built_at is None:
+                return
+            if account_id is None:
+                self._checked_at.clear()
+                self._built_at = float('-inf')
+            else:
+                self._checked_at[account_id] = float('-inf')
+
+    def discard(self, account_id, request_ids):
+        """Forget ids that are no longer pending"""
+        with self._lock:
+            ids = self._ids.get(account_id)
+            if not ids:
+                return
+            for request_id in request_ids:
+                ids.pop(request_id, None)
+            self._compact(account_id)
+
+    def confirm_empty(self, account_id, since_sequence):
+        """
+        Record that the database had nothing else pending for the account
+
+        Only ids pushed before `since_sequence` are dropped; anything pushed
+        while the database was being queried is kept.
+        """
+        with self._lock:
+            ids = self._ids.get(account_id)
+            if ids:
+                for request_id, sequence in list(ids.items()):
+                    if sequence <= since_sequence:
+                        del ids[request_id]
+                self._compact(account_id)
+            self._checked_at[account_id] = time.monotonic()
+
+    def oldest(self, account_id):
+        """Return the created_at of the oldest pending request, or None"""
+        with self._lock:
+            heap = self._heaps.get(account_id)
+            ids = self._ids.get(account_id, {})
+            while heap and heap[0][1] not in ids:
+                heapq.heappop(heap)
+            return heap[0][0] if heap else None
+
+    def depth(self, account_id=None):
+        """Return the number of pending requests of one account, or of all of them"""
+        with self._lock:
+            if account_id is not None:
+                return len(self._ids.get(account_id, ()))
+            return sum(len(ids) for ids in self._ids.values())
+
+    def _compact(self, account_id):
+        # Caller holds the lock
+        ids = self._ids[account_id]
+        if not ids:
+            del self._ids[account_id]
+            self._heaps.pop(account_id, None)
+            return
+        heap = self._heaps[account_id]
+        if len(heap) > 2 * len(ids) + 16:
+            # A set also drops duplicates left by an id that was requeued
+            heap[:] = {entry for entry in heap if entry[1] in ids}
+            heapq.heapify(heap)
+
+
+pending_index = PendingIndex(PENDING_INDEX_MAX_AGE)
@@ -0,0 +1,133 @@
+"""
+Declarative request-body schemas
+
+A Schema lists the fields of a JSON body once, at import time, with the
+validate_* function and the conversion of each. ``Schema.parse`` checks a
+body in one pass and returns the converted values; the ``body`` decorator
+does that for a route and passes the values to it as keyword arguments.
+
+Fields are checked in declaration order and the first failure is
+reported, with the same messages the routes returned when they validated
+each field by hand:
+
+  1. a body that is not a JSON object fails with the schema's `missing`
+     message (or ERROR_BODY_REQUIRED when it has none)
+  2. if any required field is missing or falsy, the `missing` message
+  3. otherwise each field's validator, then its conversion
+"""
+from functools import wraps
+from flask import request, jsonify
+from constants import ERROR_BODY_REQUIRED
+
+_ABSENT = object()
+
+
+class ValidationError(ValueError):
+    """A body failed its schema; `field` names the member at fault, None for the body as a whole"""
+
+    def __init__(self, message, field=None):
+        super().__init__(message)
+        self.field = field
+
+
+class Field:
+    """
+    One member of a JSON body
+
+    Args:
+        name: Key in the body, and the keyword argument the route receives
+        validate: validate_*-style function returning (is_valid, error_message)
+        coerce: Conversion applied to the value once it is valid
+        required: Whether a missing or falsy value fails with the schema's `missing` message
+        default: Value used when the key is absent
+    """
+
+    __slots__ = ('name', 'validate', 'coerce', 'required', 'default')
+
+    def __init__(self, name, validate=None, coerce=None, required=False, default=None):
+        self.name = name
+        self.validate = validate
+        self.coerce = coerce
+        self.required = required
+        self.default = default
+
+
+class Schema:
+    """An ordered set of Fields and the message for a body that lacks a required one"""
+
+    def __init__(self, *fields, missing=None):
+        self.fields = fields
+        self.missing = missing
+        # (name, validate, coerce, default) per field and the required names, built once
+        self._steps = tuple((f.name, f.validate, f.coerce, f.default) for f in fields)
+        self._required = tuple(f.name for f in fields if f.required)
+
+    def parse(self, data):
+        """
+        Validate and convert a decoded JSON body
+
+        Returns:
+            dict: converted value per field name
+
+        Raises:
+            ValidationError: for the first field that fails
+        """
+        if not isinstance(data, dict):
+            raise ValidationError(self.missing or ERROR_BODY_REQUIRED)
+
+        for name in self._required:
+            if not data.get(name):
+                raise ValidationError(self.missing, name)
+
+        values = {}
+        for name, validate, coerce, default in self._steps:
+            value = data.get(name, _ABSENT)
+            if value is _ABSENT:
+                value = default
+            if validate is not None:
+                is_valid, error = validate(value)
+                if not is_valid:
+                    raise ValidationError(error, name)
+            if coerce is not None and value is not None:
+                value = coerce(value)
+            values[name] = value
+        return values
+
+
+def one_of(choices, error):
+    """Build a validator accepting only the given values"""
+    allowed = frozenset(choices)
+
+    def validate(value):
+        try:
+            if value in allowed:
+                return True, None
+        except TypeError:
+            pass  # Unhashable JSON values such as lists
+        return False, error
+
+    return validate
+
+
+def body(schema):
+    """
+    Decorator that parses the JSON body with `schema` and passes its fields to the route
+
+    An empty or missing body fails with ERROR_BODY_REQUIRED; any other
+    failure with the schema's message. Both are 400 responses.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': ERROR_BODY_REQUIRED}), 400
+            try:
+                kwargs.update(schema.parse(data))
+            except ValidationError as e:
+                return jsonify({'error': str(e)}), 400
+            return f(*args, **kwargs)
+
+        return decorated_function
+
+    return decorator
@@ -0,0 +1,34 @@
+"""
+Storage units for timestamps and amounts
+
+Timestamps are stored as integer milliseconds since the Unix epoch (UTC)
+and amounts as integer minor units, which keeps rows and indexes compact
+and makes ORDER BY compare integers instead of ISO-8601 strings. The API
+still speaks ISO-8601 strings and decimal amounts.
+"""
+import time
+from datetime import datetime, timezone
+from decimal import Decimal, ROUND_HALF_UP
+from constants import AMOUNT_SCALE
+
+
+def now_ms():
+    """Current UTC time in epoch milliseconds"""
+    return time.time_ns() // 1_000_000
+
+
+def iso_from_ms(ms):
+    """Render epoch milliseconds as an ISO-8601 UTC string"""
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).isoformat(timespec='milliseconds')
+
+
+def to_minor_units(amount):
+    """Convert a decimal amount (str, int or float) to integer minor units"""
+    return int((Decimal(str(amount)) * AMOUNT_SCALE).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(minor):
+    """Convert integer minor units back to a decimal amount for the API"""
+    return minor / AMOUNT_SCALE
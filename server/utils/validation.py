@@ -1,16 +1,26 @@
 """
 Input validation utilities for security
+
+The patterns are compiled once at import; utils/schema.py runs these
+functions for every request body field.
 """
+import math
 import re
+from decimal import Decimal, InvalidOperation
 from typing import Optional, Union
 from constants import (
     MAX_PHONE_NUMBER_LENGTH,
     MAX_NAME_LENGTH,
     ERROR_PHONE_NUMBER_TOO_LONG,
     ERROR_NAME_TOO_LONG,
-    ERROR_NAME_IS_DIGIT
+    ERROR_NAME_IS_DIGIT,
+    ERROR_INVALID_LEASE_TOKEN,
+    AMOUNT_SCALE,
 )
 
+_DANGEROUS_NAME_CHARS = re.compile(r'[<>"\'&;()|`$]')
+_DANGEROUS_INPUT_CHARS = re.compile(r'[<>"\';()&|`$\\]')
+
 
 def validate_phone_number(phone_number: str) -> tuple[bool, Optional[str]]:
     """
@@ -24,15 +34,21 @@ def validate_phone_number(phone_number: str) -> tuple[bool, Optional[str]]:
     """
     if not phone_number:
         return False, "Phone number is required"
+
+    if not isinstance(phone_number, str):
+        return False, "Invalid phone number format"
     
     if len(phone_number) > MAX_PHONE_NUMBER_LENGTH:
         return False, ERROR_PHONE_NUMBER_TOO_LONG
     
-    # Remove any non-digit characters for validation
-    digits_only = re.sub(r'[^\d]', '', phone_number)
+    # Count the digits (any script, like \d) without building a digits-only copy
+    if phone_number.isdecimal():
+        digits = len(phone_number)
+    else:
+        digits = sum(map(str.isdecimal, phone_number))
     
     # Check if it's a valid phone number format (at least 7 digits)
-    if len(digits_only) < 7 or len(digits_only) > 15:
+    if digits < 7 or digits > 15:
         return False, "Invalid phone number format"
     
     return True, None
@@ -50,20 +66,23 @@ def validate_name(name: str) -> tuple[bool, Optional[str]]:
     """
     if not name:
         return False, "Name is required"
+
+    if not isinstance(name, str):
+        return False, "Name contains invalid characters"
     
-    if len(name.strip()) == 0:
+    stripped = name.strip()
+    if not stripped:
         return False, "Name cannot be empty"
     
     if len(name) > MAX_NAME_LENGTH:
         return False, ERROR_NAME_TOO_LONG
     
     # Check if name contains only digits
-    if name.strip().isdigit():
+    if stripped.isdigit():
         return False, ERROR_NAME_IS_DIGIT
     
     # Check for potentially dangerous characters
-    dangerous_chars = ['<', '>', '"', "'", '&', ';', '(', ')', '|', '`', '$']
-    if any(char in name for char in dangerous_chars):
+    if _DANGEROUS_NAME_CHARS.search(name):
         return False, "Name contains invalid characters"
     
     return True, None
@@ -81,19 +100,30 @@ def validate_amount(amount: Union[str, int, float]) -> tuple[bool, Optional[str]
     """
     if amount is None:
         return False, "Amount is required"
+
+    # float() accepts both, but neither can be stored as minor units
+    if isinstance(amount, bool):
+        return False, "Invalid amount format"
     
     try:
         amount_float = float(amount)
+
+        if math.isnan(amount_float):
+            return False, "Invalid amount format"
         
         if amount_float <= 0:
             return False, "Amount must be greater than 0"
         
         if amount_float > 999999999:  # Reasonable upper limit
             return False, "Amount is too large"
+
+        # Stored as integer minor units, so anything finer would be rounded away
+        if Decimal(str(amount)) * AMOUNT_SCALE % 1:
+            return False, "Amount has too many decimal places"
         
         return True, None
         
-    except (ValueError, TypeError):
+    except (ValueError, TypeError, InvalidOperation):
         return False, "Invalid amount format"
 
 
@@ -111,7 +141,7 @@ def sanitize_input(input_string: str) -> str:
         return ""
     
     # Remove potentially dangerous characters
-    sanitized = re.sub(r'[<>"\';()&|`$\\]', '', input_string)
+    sanitized = _DANGEROUS_INPUT_CHARS.sub('', input_string)
     
     # Limit length to prevent buffer overflow
     return sanitized[:1000]
@@ -165,3 +195,29 @@ def validate_contact_id(contact_id: Union[str, int]) -> tuple[bool, Optional[str
         
     except (ValueError, TypeError):
         return False, "Invalid contact ID format"
+
+
+def validate_lease_token(lease_token: Union[str, int, None]) -> tuple[bool, Optional[str]]:
+    """
+    Validate the lease token a device echoes back with a result
+
+    The token is optional for older devices, so None is valid.
+    
+    Args:
+        lease_token: Lease token to validate
+        
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    if lease_token is None:
+        return True, None
+
+    if isinstance(lease_token, bool):
+        return False, ERROR_INVALID_LEASE_TOKEN
+    
+    try:
+        int(lease_token)
+        return True, None
+        
+    except (ValueError, TypeError):
+        return False, ERROR_INVALID_LEASE_TOKEN